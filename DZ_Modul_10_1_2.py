@@ -1,10 +1,155 @@
+import bisect
+import contextlib
+import cProfile
+import gc
+import heapq
+import io
+import itertools
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+import types
+
+LATENCY_BUCKETS = (0.00001, 0.0001, 0.001, 0.01, 0.1, 1.0)                                          # Межі кошиків гістограми затримок у секундах
+
+class Metrics:                                                                                      # Збирає статистику викликів обробників, коли увімкнена
+    def __init__(self):
+        self.enabled = False
+        self.profile_every = 0                                                                      # Профілювати кожен N-й виклик команди (0 — не профілювати)
+        self.dump_path = None
+        self.dump_interval = 60
+        self.profiling = threading.Lock()                                                           # Профілює лише зовнішній виклик: вкладені обробники й інші потоки не запускають другий профайлер
+        self.reset()
+
+    def reset(self):                                                                                # Очищає зібрану статистику
+        self.commands = {}
+        self.touched = 0                                                                            # Лічильник записів, яких торкнулися обробники
+        self.profile = None
+        self.last_dump = time.monotonic()
+
+    def touch(self, count=1):                                                                       # Позначає, що поточна команда торкнулася count записів
+        if self.enabled:
+            self.touched += count
+
+    def call(self, func, args, kwargs):                                                             # Викликає обробник, вимірюючи час, помилки та торкнуті записи
+        state = self.begin(func)
+        try:
+            result = func(*args, **kwargs)
+        except (KeyError, ValueError, IndexError) as e:
+            self.end(state, e)
+            return "Invalid command or argument. Please try again."
+        except Exception as e:
+            self.end(state, e)
+            raise
+        if isinstance(result, types.GeneratorType):                                                 # Потокова відповідь виконується під час читання, тож і вимірюємо її тоді
+            return self.stream(result, state)
+        self.end(state)
+        return result
+
+    def stream(self, lines, state):                                                                 # Передає рядки потокової відповіді, завершуючи вимірювання після останнього
+        error = None
+        try:
+            yield from lines
+        except (KeyError, ValueError, IndexError) as e:
+            error = e
+            yield "Invalid command or argument. Please try again."
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self.end(state, error)
+
+    def begin(self, func):                                                                          # Починає вимірювання виклику; повертає стан для end
+        stats = self.commands.get(func.__qualname__)
+        if stats is None:
+            stats = self.commands[func.__qualname__] = {"calls": 0, "errors": {}, "touched": 0, "total_seconds": 0.0, "histogram": [0] * (len(LATENCY_BUCKETS) + 1), "peak_memory": 0}
+        stats["calls"] += 1
+        sampled = self.profile_every and stats["calls"] % self.profile_every == 0 and self.profiling.acquire(blocking=False)
+        if sampled:
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:                                                                      # Профілювання вже запущене іншим інструментом
+                self.profiling.release()
+                sampled = False
+        if sampled:
+            tracing = tracemalloc.is_tracing()
+            if not tracing:
+                tracemalloc.start()
+        else:
+            profiler = tracing = None
+        return stats, profiler, tracing, self.touched, time.perf_counter()
+
+    def end(self, state, error=None):                                                               # Завершує вимірювання: час, помилка, профіль і торкнуті записи
+        stats, profiler, tracing, touched, started = state
+        elapsed = time.perf_counter() - started
+        if error is not None:
+            stats["errors"][type(error).__name__] = stats["errors"].get(type(error).__name__, 0) + 1
+        if profiler:
+            profiler.disable()
+            stats["peak_memory"] = max(stats["peak_memory"], tracemalloc.get_traced_memory()[1])
+            if not tracing:
+                tracemalloc.stop()
+            if self.profile is None:
+                self.profile = pstats.Stats(profiler)
+            else:
+                self.profile.add(profiler)
+            self.profiling.release()
+        stats["total_seconds"] += elapsed
+        stats["histogram"][bisect.bisect_left(LATENCY_BUCKETS, elapsed)] += 1
+        stats["touched"] += self.touched - touched
+        if self.dump_path and time.monotonic() - self.last_dump >= self.dump_interval:
+            self.dump()
+
+    def report(self):                                                                               # Формує текстовий звіт для команди stats
+        if not self.commands:
+            return "No statistics collected." if self.enabled else "Statistics are disabled. Use 'stats on' to enable them."
+        labels = [f"<{bound * 1000:g}ms" for bound in LATENCY_BUCKETS] + [f">={LATENCY_BUCKETS[-1] * 1000:g}ms"]
+        lines = ["Command statistics:"]
+        for name, stats in sorted(self.commands.items(), key=lambda item: -item[1]["total_seconds"]):
+            average = stats["total_seconds"] / stats["calls"] * 1000
+            histogram = ", ".join(f"{label}: {count}" for label, count in zip(labels, stats["histogram"]) if count) or "pending"
+            errors = ", ".join(f"{error}: {count}" for error, count in stats["errors"].items()) or "none"
+            lines.append(f"{name}: calls {stats['calls']}, avg {average:.3f}ms, touched {stats['touched']}, errors {errors}, latency {histogram}")
+        if self.profile:
+            output = io.StringIO()
+            self.profile.stream = output
+            self.profile.sort_stats("cumulative").print_stats(10)
+            lines.append(output.getvalue().rstrip())
+        return "\n".join(lines)
+
+    def dump(self):                                                                                 # Атомарно записує статистику у JSON файл
+        self.last_dump = time.monotonic()
+        temp_path = self.dump_path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            json.dump({"time": time.time(), "buckets": LATENCY_BUCKETS, "commands": self.commands}, file)
+        os.replace(temp_path, self.dump_path)
+
+metrics = Metrics()
+
+def guard_lines(lines):                                                                             # Передає рядки потокової відповіді, замінюючи помилку введення повідомленням
+    try:
+        yield from lines
+    except (KeyError, ValueError, IndexError):
+        yield "Invalid command or argument. Please try again."
+
 def input_error(func):                                                                               # Декоратор, що обробляє помилки введення
     
     def wrapper(*args, **kwargs):                                                  
+        if metrics.enabled:                                                                         # Вимкнена статистика коштує лише одну перевірку
+            return metrics.call(func, args, kwargs)
         try:
-            return func(*args, **kwargs)
+            result = func(*args, **kwargs)
         except (KeyError, ValueError, IndexError):
             return "Invalid command or argument. Please try again."
+        if isinstance(result, types.GeneratorType):
+            return guard_lines(result)
+        return result
+    wrapper.__name__ = func.__name__
     return wrapper
 
 @input_error
@@ -21,49 +166,84 @@ def parse_input(user_input):
 
 import re
 
+DIGITS_PATTERN = re.compile(r'^\d+$')
+PHONE_INPUT_PATTERN = re.compile(r'^(?:[-(). ]*\d){10}[-(). ]*$')                                   # 10 цифр, між якими можуть бути дужки, дефіси й крапки
+PHONE_SEPARATORS = str.maketrans("", "", " -().")
+DATE_PATTERN = re.compile(r'^(\d{1,2})-(\d{1,2})-(\d{4})$', re.ASCII)
+
 @input_error
 def add_contact(args, contacts):                                                                     # Додає новий контакт до списку контактів
     if len(args) != 2:
         return "Give me name and phone, please."
     name, phone = args
-    if not re.match(r'^\d+$', phone):                                               
-        return "Phone number must contain only digits."
-    contacts[name] = phone
+    try:
+        contacts[name] = Phone(phone)
+    except ValueError as e:
+        return str(e)
     return "Contact added."
 
+def parse_options(args, value_options=()):                                                          # Відокремлює опції виду --key [value] від звичайних аргументів
+    positional = []
+    options = {}
+    i = 0
+    while i < len(args):
+        arg = args[i]
+        if arg.startswith("--"):
+            key, sep, value = arg[2:].partition("=")
+            if not sep and key in value_options:
+                i += 1
+                value = args[i]
+            options[key] = value if (sep or key in value_options) else True
+        else:
+            positional.append(arg)
+        i += 1
+    return positional, options
+
 @input_error
 def search_records(args, address_book):                                                             # Шукає контакти за іменем або номером телефону                                               
+    args, options = parse_options(args, value_options=("limit", "page"))
     if len(args) != 1:
         return "Invalid command. Please provide a name or phone number to search for."
     search_term = args[0]
-    matching_contacts = []
-    for name, record in address_book.data.items():
-        if re.search(search_term, name):
-            matching_contacts.append((name, record.phones))
-        else:
-            for phone in record.phones:
-                if re.search(search_term, phone):
-                    matching_contacts.append((name, phone))
-                    break  
-    if matching_contacts:
+    mode = "substring"
+    for option in ("exact", "prefix", "substring"):
+        if options.get(option):
+            mode = option
+    limit = int(options["limit"]) if "limit" in options else None
+    offset = (int(options.get("page", 1)) - 1) * (limit or 0)
+    if options.get("regex"):                                                                        # Регулярний вираз не індексується — скануємо всю книгу паралельно
+        try:
+            names = parallel_scan(address_book, regex_scan, (search_term,))
+        except re.error:
+            return "Invalid regular expression."
+        names = names[offset:offset + limit if limit else None]
+    else:
+        names = address_book.search(search_term, mode=mode, ignore_case=bool(options.get("ignore-case")), limit=limit, offset=offset)
+    if names:
         result = "Matching contacts:\n"
-        for contact in matching_contacts:
-            if isinstance(contact[1], list):  
-                phones = ", ".join(contact[1])
-                result += f"{contact[0]}: {phones}\n"
-            else:
-                result += f"{contact[0]}: {contact[1]}\n"
+        for name in names:
+            phones = ", ".join(map(str, address_book.data[name].phones))
+            result += f"{name}: {phones}\n"
         return result
     else:
         return "No matching contacts found."
 
+@input_error
+def phone_search(args, address_book):                                                               # Шукає контакти за частиною номера телефону
+    args, options = parse_options(args, value_options=("limit",))
+    if len(args) != 1:
+        return "Invalid command. Please provide the digits to search for."
+    limit = int(options["limit"]) if "limit" in options else None
+    matches = address_book.find_phones(args[0], "ends" if options.get("ends") else "contains", limit)
+    if not matches:
+        return "No matching contacts found."
+    return "Matching contacts:\n" + "\n".join(f"{name}: {phone}" for name, phone in matches)
+
 @input_error
 def add_record(args, address_book):                                                                 # Додає новий запис до адресної книги
     if len(args) < 2:
         return "Invalid command. Please provide a name and a phone number for the new record."
     name, phone = args[0], args[1]
-    if not re.match(r'^\d+$', phone):                                              
-        return "Phone number must contain only digits."
     return address_book.add_record(name, phone)  
 
 
@@ -73,21 +253,18 @@ def change_contact(args, address_book):
         return "Invalid command. Please provide both username and new phone number."    
     name, new_value = args                                                             
     if name in address_book.data:                                                            
-        if re.match(r'^\d+$', new_value):                                          
-            address_book.data[name].phones = [new_value]                                                     
-            return "Contact updated."
-        else:
-            return "Invalid phone number. Please provide a valid phone number for the contact."
+        address_book.set_phones(name, [new_value])
+        return "Contact updated."
     else:
         return f"Contact '{name}' not found."
 
 @input_error
-def get_phone(args, contacts):                                                                       # Повертає номер телефону для заданого контакту
+def get_phone(args, address_book):                                                                   # Повертає номер телефону для заданого контакту
     if len(args) != 1:                                                              
         return "Invalid command. Please provide username."    
     name = args[0]                                                                  
-    if name in contacts:                                                            
-        return f"Phone number for {name}: {contacts[name]}"                         
+    if name in address_book.data:                                                            
+        return f"Phone number for {name}: {', '.join(map(str, address_book.data[name].phones))}"
     else:
         return f"Contact '{name}' not found."
     
@@ -97,8 +274,9 @@ def update_phone(args, contacts):
         return "Invalid command. Please provide both username and new phone number."    
     name, new_phone = args                                                              
     if name in contacts:   
-        if len(new_phone) == 10 and new_phone.isdigit():  
-            contacts[name] = new_phone                                                     
+        phone = normalize_phone(new_phone)
+        if phone is not None:  
+            contacts[name] = phone                                                     
             return "Contact updated."
         else:
             return "Invalid phone number. Please provide a valid 10-digit phone number for the contact."
@@ -107,11 +285,7 @@ def update_phone(args, contacts):
     
 def show_all_contacts(address_book):                                                    
     if address_book.data:                                                                           # Виводить всі контакти, збережені в адресній книзі
-        print("All contacts:")
-        for name, record in address_book.data.items():
-            phones = ", ".join(record.phones)
-            birthday = record.get_birthday() if record.birthday else "No birthday specified"
-            print(f"Name: {name}, Phones: {phones}, Birthday: {birthday}")
+        write_result(contact_lines(address_book.iter_contacts()), sys.stdout)
     else:
         print("No contacts found.")
 
@@ -119,18 +293,52 @@ def show_all_contacts(address_book):
 def get_all_contacts(contacts):                                                                     # Повертає рядок, що містить всі контакти
     if not contacts:                                                                
         return "No contacts found."    
-    result = "Contacts:\n"                                                          
-    for name, phone in contacts.items():
-        result += f"{name}: {phone}\n"
-    return result
+    return "Contacts:\n" + "".join(f"{name}: {phone}\n" for name, phone in contacts.items())
+
+CONTACT_FIELDS = ("name", "phones", "birthday")
+
+def format_contact(row):                                                                            # Форматує контакт з вибраних полів
+    parts = []
+    if "name" in row:
+        parts.append(f"Name: {row['name']}")
+    if "phones" in row:
+        parts.append(f"Phones: {', '.join(map(str, row['phones']))}")
+    if "birthday" in row:
+        parts.append(f"Birthday: {row['birthday'] or 'No birthday specified'}")
+    return ", ".join(parts)
+
+def contact_lines(rows, limit=None, with_cursor=True):                                              # Генерує рядки виводу контактів; після повної сторінки — курсор наступної
+    yield "All contacts:"
+    count = 0
+    last_cursor = None
+    for cursor, row in rows:
+        if limit and count == limit:
+            if with_cursor:                                                                         # Без сортування курсор не приймається, тож і не показуємо його
+                yield f"Next cursor: {last_cursor}"
+            return
+        yield format_contact(row)
+        count += 1
+        last_cursor = cursor
+
+def write_result(result, output, chunk_size=1024):                                                  # Пише відповідь: рядок одразу, генератор рядків — буферизованими частинами
+    if isinstance(result, str):
+        output.write(result + "\n")
+        return
+    buffer = []
+    for line in result:
+        buffer.append(line)
+        if len(buffer) >= chunk_size:
+            output.write("\n".join(buffer) + "\n")
+            buffer.clear()
+    if buffer:
+        output.write("\n".join(buffer) + "\n")
 
 @input_error
 def delete_contact_by_name(args, address_book):                                                     # Видаляє контакт з адресної книги за ім'ям
     if len(args) != 1:
         return "Invalid command. Please provide the name of the contact to delete."
     name = args[0]
-    if name in address_book.data:
-        del address_book.data[name]
+    if address_book.delete_record(name):
         return "Contact deleted."
     else:
         return f"Contact '{name}' not found."
@@ -140,10 +348,8 @@ def delete_contact_by_phone(args, address_book):
     if len(args) != 1:
             return "Invalid command. Please provide the phone number of the contact to delete."
     phone = args[0]
-    for name, record in address_book.data.items():
-        if phone in record.phones:
-            del address_book.data[name]
-            return "Contact deleted."
+    if address_book.delete_by_phone(phone):
+        return "Contact deleted."
     return f"Contact with phone number '{phone}' not found."
 
 @input_error
@@ -156,40 +362,19 @@ def add_birthday(args, address_book):
             if address_book.data[name].birthday:
                 return "Birthday already exists for this contact. If you want to update it, please use the 'change_birthday' command."
             else:
-                address_book.data[name].add_birthday(birthday)
-                return "Birthday added."
+                return address_book.data[name].add_birthday(birthday)
         except ValueError as e:
             return str(e)
     else:
         return f"Contact '{name}' not found."
         
-@input_error
-def show_birthday(args, address_book):                                                              # Показує день народження для вказаного контакту
-    if len(args) != 1:
-        return "Invalid command. Please provide the name of the contact."
-    name = args[0]
-    if name in address_book.data:
-        if address_book.data[name].birthday:
-            birthday_date = address_book.data[name].birthday.get_value().strftime('%d-%m-%Y')
-            return f"{name}'s birthday: {birthday_date}"
-        else:
-            return f"No birthday specified for {name}."
-    else:
-        return f"Contact '{name}' not found."
-
 from datetime import datetime, timedelta
 
 @input_error
 def birthdays(args, address_book):                                                                  # Повертає список майбутніх днів народження наступного тижня
-    today = datetime.now().date()
-    next_week = today + timedelta(days=7)
     upcoming_birthdays = []
-
-    for name, record in address_book.data.items():
-        if record.birthday:
-            birthday_date = record.birthday.get_value()
-            if birthday_date.month == next_week.month and birthday_date.day in range(next_week.day - 6, next_week.day + 1):
-                upcoming_birthdays.append((name, birthday_date.strftime('%d-%m-%Y')))
+    for record in address_book.get_upcoming_birthdays():
+        upcoming_birthdays.append((record.name.get_value(), record.get_birthday()))
 
     if upcoming_birthdays:
         result = "Upcoming birthdays:\n"
@@ -198,6 +383,25 @@ def birthdays(args, address_book):
         return result
     else:
         return "No upcoming birthdays."
+
+@input_error
+def undo(args, address_book):                                                                       # Скасовує останню зміну адресної книги
+    if address_book.undo():
+        return "Last change undone."
+    return "Nothing to undo."
+
+@input_error
+def redo(args, address_book):                                                                       # Повторює останню скасовану зміну
+    if address_book.redo():
+        return "Last change redone."
+    return "Nothing to redo."
+
+@input_error
+def reminders(args, address_book):                                                                  # Повертає нагадування про дні народження, що настали з попередньої перевірки
+    due = list(address_book.birthday_scheduler().due())
+    if not due:
+        return "No new birthday reminders."
+    return "Birthday reminders:\n" + "\n".join(f"{name}: {occurrence.day:02d}-{occurrence.month:02d}-{occurrence.year}" for occurrence, name in due)
     
 @input_error
 def show_birthday(args, address_book):                                                              # Показує день народження для вказаного контакту
@@ -206,69 +410,383 @@ def show_birthday(args, address_book):
     name = args[0]
     if name in address_book.data:
         if address_book.data[name].birthday:
-            return f"{name}'s birthday: {address_book.data[name].birthday.get_value().strftime('%d-%m-%Y')}"
+            return f"{name}'s birthday: {address_book.data[name].birthday}"
         else:
             return f"No birthday specified for {name}."
     else:
         return f"Contact '{name}' not found."
 
+import csv
+
+def read_contacts(path):                                                                            # Потоково читає контакти з CSV або JSONL файлу
+    with open(path, encoding="utf-8", newline="") as file:
+        if path.endswith(".csv"):
+            yield from csv.DictReader(file)
+        else:
+            for line in file:
+                if line.strip():
+                    yield line                                                                      # Рядок розбирає parse_contact_row, щоб зіпсований JSON відхилив лише цей рядок
+
+def iter_contact_rows(address_book):                                                                # Генерує рядки для експорту: ім'я, телефони, день народження
+    for name, record in address_book.data.items():
+        yield {"name": name, "phones": [str(phone) for phone in record.phones], "birthday": record.get_birthday()}
+
+def write_contacts(path, rows):                                                                     # Потоково записує контакти у CSV або JSONL файл
+    count = 0
+    with open(path, "w", encoding="utf-8", newline="") as file:
+        if path.endswith(".csv"):
+            writer = csv.writer(file)
+            writer.writerow(["name", "phones", "birthday"])
+            for row in rows:
+                writer.writerow([row["name"], ";".join(row["phones"]), row["birthday"] or ""])
+                count += 1
+        else:
+            for row in rows:
+                file.write(json.dumps(row, ensure_ascii=False) + "\n")
+                count += 1
+    return count
+
+@input_error
+def import_contacts(args, address_book):                                                            # Імпортує контакти з CSV або JSONL файлу
+    args, options = parse_options(args, value_options=("workers",))
+    if len(args) != 1:
+        return "Invalid command. Please provide the path to a .csv or .jsonl file."
+    try:
+        loaded, rejected = address_book.bulk_load(read_contacts(args[0]), workers=int(options.get("workers", 1)))
+    except OSError as e:
+        return f"Cannot read file: {e}"
+    result = f"Imported {loaded} contacts, rejected {len(rejected)} rows."
+    for number, reason in rejected[:10]:
+        result += f"\nRow {number}: {reason}"
+    return result
+
+@input_error
+def export_contacts(args, address_book):                                                            # Експортує контакти у CSV або JSONL файл
+    if len(args) != 1:
+        return "Invalid command. Please provide the path to a .csv or .jsonl file."
+    try:
+        count = write_contacts(args[0], iter_contact_rows(address_book))
+    except OSError as e:
+        return f"Cannot write file: {e}"
+    return f"Exported {count} contacts."
+
+@input_error
+def hello(args, address_book):                                                                      # Вітається з користувачем
+    return "How can I help you?"
+
+@input_error
+def all_contacts(args, address_book):                                                               # Повертає генератор рядків з контактами адресної книги (посторінково)
+    args, options = parse_options(args, value_options=("page", "limit", "sort", "fields", "cursor"))
+    if not address_book.data:
+        return "No contacts found."
+    sort = options.get("sort")
+    if sort not in (None, "name", "birthday"):
+        return "Invalid sort order. Use 'name' or 'birthday'."
+    fields = options["fields"].split(",") if "fields" in options else CONTACT_FIELDS
+    if not all(field in CONTACT_FIELDS for field in fields):
+        return f"Invalid fields. Choose from: {', '.join(CONTACT_FIELDS)}."
+    cursor = options.get("cursor")
+    if cursor and not sort:
+        return "A cursor requires --sort name or --sort birthday."
+    if cursor and sort == "birthday":
+        step, separator, _ = cursor.partition(":")
+        if not separator or not step.isascii() or not step.isdigit() or int(step) > 366:
+            return "Invalid cursor."
+    limit = int(options["limit"]) if "limit" in options else None
+    page = int(options.get("page", 1))
+    if page < 1 or (limit is not None and limit < 1):
+        return "Page and limit must be positive numbers."
+    rows = address_book.iter_contacts(sort, cursor, fields)
+    if limit:
+        rows = itertools.islice(rows, (page - 1) * limit, page * limit + 1)                         # Один зайвий рядок показує, чи є наступна сторінка
+    metrics.touch(limit or len(address_book.data))
+    return contact_lines(rows, limit, with_cursor=sort is not None)
+
+@input_error
+def help_text(args, address_book):                                                                  # Формує список доступних команд з таблиці команд
+    lines = ["Available commands:"]
+    for name, entry in COMMANDS.items():
+        usage = " ".join([name] + [f"<{arg}>" for arg in entry["args"]] + ([entry["options"]] if entry.get("options") else []))
+        lines.append(f"{usage} - {entry['help']}")
+    lines.append("close/exit - Close the bot")
+    return "\n".join(lines)
+
+@input_error
+def stats(args, address_book):                                                                      # Показує, вмикає, вимикає або очищає статистику команд
+    args, options = parse_options(args, value_options=("profile", "dump", "interval"))
+    action = args[0] if args else "show"
+    if action == "on":
+        metrics.profile_every = int(options.get("profile", 0))
+        metrics.dump_path = options.get("dump")
+        metrics.dump_interval = float(options.get("interval", 60))
+        metrics.enabled = True
+        return "Statistics enabled."
+    elif action == "off":
+        metrics.enabled = False
+        return "Statistics disabled."
+    elif action == "reset":
+        metrics.reset()
+        return "Statistics cleared."
+    elif action == "show":
+        return metrics.report()
+    return "Invalid command. Use 'stats [on|off|reset]'."
+
+@input_error
+def birthday_report(args, address_book):                                                            # Показує кількість днів народження по місяцях
+    counts = birthday_month_counts(book_rows(address_book))                                         # Один прохід по місяцях дешевший за передачу книги іншим процесам
+    lines = ["Birthdays by month:"]
+    for month, count in enumerate(counts, 1):
+        lines.append(f"{calendar.month_name[month]}: {count}")
+    return "\n".join(lines)
+
+PHONE_VALIDATOR = (PHONE_INPUT_PATTERN, "Phone number must be exactly 10 digits.")
+BIRTHDAY_VALIDATOR = (DATE_PATTERN, "Invalid date format. Use DD-MM-YYYY")
+
+COMMANDS = {                                                                                        # Таблиця команд: обробник, аргументи, перевірки, опис, чи змінює команда книгу і чи працює з файлами сервера
+    "hello": {"handler": hello, "args": [], "help": "Greet the bot"},
+    "add": {"handler": add_record, "args": ["name", "phone"], "validators": {1: PHONE_VALIDATOR}, "help": "Add a new contact", "writes": True},
+    "change": {"handler": change_contact, "args": ["name", "phone"], "validators": {1: (PHONE_INPUT_PATTERN, "Invalid phone number. Please provide a valid 10-digit phone number for the contact.")}, "help": "Change the phone number of an existing contact", "writes": True},
+    "phone": {"handler": get_phone, "args": ["name"], "help": "Get the phone number of a contact"},
+    "all_contacts": {"handler": all_contacts, "args": [], "options": "[--page N] [--limit N] [--sort name|birthday] [--cursor C] [--fields name,phones,birthday]", "help": "Show all saved contacts"},
+    "search_records": {"handler": search_records, "args": ["term"], "options": "[--exact|--prefix|--regex] [--ignore-case] [--limit N] [--page N]", "help": "Search contacts name or phone number"},
+    "add_record": {"handler": add_record, "args": ["name", "phone"], "validators": {1: PHONE_VALIDATOR}, "help": "Add contacts", "writes": True},
+    "add_birthday": {"handler": add_birthday, "args": ["name", "DD-MM-YYYY"], "validators": {1: BIRTHDAY_VALIDATOR}, "help": "Add birthday for a contact", "writes": True},
+    "delete_contact_by_name": {"handler": delete_contact_by_name, "args": ["name"], "help": "Delete a contact by name", "writes": True},
+    "phone_search": {"handler": phone_search, "args": ["digits"], "options": "[--ends] [--limit N]", "validators": {0: (DIGITS_PATTERN, "Please provide digits to search for.")}, "help": "Find contacts whose phone contains or ends with the digits"},
+    "delete_contact_by_phone": {"handler": delete_contact_by_phone, "args": ["phone"], "help": "Delete a contact by phone number", "writes": True},
+    "show_birthday": {"handler": show_birthday, "args": ["name"], "help": "Show birthday for a contact"},
+    "birthday_report": {"handler": birthday_report, "args": [], "help": "Show how many birthdays fall in each month"},
+    "get_upcoming_birthdays": {"handler": birthdays, "args": [], "help": "Show upcoming birthdays for the next week"},
+    "undo": {"handler": undo, "args": [], "help": "Undo the last change", "writes": True},
+    "redo": {"handler": redo, "args": [], "help": "Redo the last undone change", "writes": True},
+    "reminders": {"handler": reminders, "args": [], "help": "Show birthday reminders that became due since the last check", "writes": True},
+    "import": {"handler": import_contacts, "args": ["file.csv|file.jsonl"], "options": "[--workers N]", "help": "Import contacts from a file", "writes": True, "undo": False, "local": True},
+    "export": {"handler": export_contacts, "args": ["file.csv|file.jsonl"], "help": "Export contacts to a file", "local": True},
+    "stats": {"handler": stats, "args": [], "options": "[on [--profile N] [--dump FILE] [--interval S]|off|reset]", "help": "Show or configure command statistics", "local": True},
+    "help": {"handler": help_text, "args": [], "help": "Show available commands"},
+}
+
+EXIT_COMMANDS = ("close", "exit")
+
+def execute(user_input, address_book):                                                              # Виконує один рядок команди; повертає відповідь або None для виходу
+    if not user_input.strip():
+        return "Invalid command."
+    parsed = parse_input(user_input)
+    if isinstance(parsed, str):                                                                     # parse_input повертає текст помилки, якщо аргументів бракує
+        return parsed
+    command, args = parsed
+    if command in EXIT_COMMANDS:
+        return None
+    entry = COMMANDS.get(command)
+    if entry is None:
+        return "Invalid command."
+    for index, (pattern, message) in entry.get("validators", {}).items():
+        if index < len(args) and not pattern.match(args[index]):
+            return message
+    if entry.get("writes") and entry.get("undo", True):                                             # Імпорт пише журнал пакетами одразу і не тримає стани всіх рядків для undo
+        with address_book.transaction():                                                            # Кожна команда, що змінює книгу, - окрема транзакція для undo
+            return entry["handler"](args, address_book)
+    return entry["handler"](args, address_book)
+
 def show_available_commands():                                                                       # Виводить список доступних команд                                          
-    print("Available commands:")
-    print("hello - Greet the bot")
-    print("add <name> <phone> - Add a new contact")
-    print("change <name> <phone> - Change the phone number of an existing contact")
-    print("phone <name> - Get the phone number of a contact")
-    print("all_contacts - Show all saved contacts")
-    print("close/exit - Close the bot")
-    print("search_records - Search contacts name or phone number")
-    print("add_record - Add contacts")
-    print("add_birthday <name> <DD-MM-YYYY> - Add birthday for a contact")
-    print("delete_contact_by_name <name> - Delete a contact by name")
-    print("delete_contact_by_phone <phone> - Delete a contact by phone number")
-    print("show_birthday <name> - Show birthday for a contact")
-    print("get_upcoming_birthdays - Show upcoming birthdays for the next week")
-
-def main():    
-    address_book = AddressBook()  
+    print(help_text([], None))
+
+def run_batch(lines, address_book, output, chunk_size=1024):                                        # Виконує команди з потоку без запрошень, відповіді пише буферизовано
+    buffer = []
+    for line in lines:
+        result = execute(line, address_book)
+        if result is None:
+            break
+        if isinstance(result, str):
+            buffer.append(result)
+        else:
+            buffer.extend(result)
+        if len(buffer) >= chunk_size:
+            output.write("\n".join(buffer) + "\n")
+            buffer.clear()
+    if buffer:
+        output.write("\n".join(buffer) + "\n")
+    output.flush()
+
+SERVER_COMMANDS = frozenset(name for name, entry in COMMANDS.items() if not entry.get("local"))     # Команди, доступні клієнтам сервера: без доступу до файлів і налаштувань процесу
+
+def is_write_command(user_input):                                                                   # Визначає, чи змінює рядок команди адресну книгу
+    parts = user_input.split()
+    return bool(parts) and COMMANDS.get(parts[0].lower(), {}).get("writes", False)
+
+import asyncio
+
+class ReadWriteLock:                                                                                # Асинхронне блокування: багато читачів або один письменник
+    def __init__(self):
+        self.readers = 0
+        self.writer = False
+        self.waiting_writers = 0
+        self.condition = asyncio.Condition()
+
+    async def acquire_read(self):
+        async with self.condition:
+            await self.condition.wait_for(lambda: not self.writer and not self.waiting_writers)     # Письменники мають пріоритет, щоб не голодувати
+            self.readers += 1
+
+    async def release_read(self):
+        async with self.condition:
+            self.readers -= 1
+            if not self.readers:
+                self.condition.notify_all()
+
+    async def acquire_write(self):
+        async with self.condition:
+            self.waiting_writers += 1
+            await self.condition.wait_for(lambda: not self.writer and not self.readers)
+            self.waiting_writers -= 1
+            self.writer = True
+
+    async def release_write(self):
+        async with self.condition:
+            self.writer = False
+            self.condition.notify_all()
+
+def frame_response(result):                                                                         # Кодує відповідь для протоколу: рядки, а в кінці рядок "."
+    lines = [("." + line if line.startswith(".") else line) for line in result.rstrip("\n").split("\n")]
+    return ("\n".join(lines) + "\n.\n").encode("utf-8")
+
+class BookServer:                                                                                   # Сервер, що обслуговує багатьох клієнтів над спільною адресною книгою
+    def __init__(self, address_book, max_pending=64, max_line=65536, commands=SERVER_COMMANDS):
+        self.address_book = address_book
+        self.commands = commands                                                                    # Дозволені клієнтам команди; решта відхиляється до виконання
+        self.max_pending = max_pending                                                              # Скільки команд клієнт може надіслати, не чекаючи відповідей
+        self.max_line = max_line
+        self.lock = ReadWriteLock()
+        self.server = None
+
+    async def start(self, host="127.0.0.1", port=8765, path=None):                                  # Запускає TCP сервер або сервер на Unix сокеті (якщо вказано path)
+        if path:
+            self.server = await asyncio.start_unix_server(self.handle_client, path, limit=self.max_line)
+        else:
+            self.server = await asyncio.start_server(self.handle_client, host, port, limit=self.max_line)
+        return self.server
+
+    async def close(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    def execute_text(self, line):                                                                   # Виконує команду й збирає потокову відповідь у рядок, поки тримаємо блокування
+        result = execute(line, self.address_book)
+        if result is None or isinstance(result, str):
+            return result
+        return "\n".join(result)
+
+    async def execute(self, line):                                                                  # Виконує команду у пулі потоків під відповідним блокуванням
+        parts = line.split()
+        if parts and parts[0].lower() in COMMANDS and parts[0].lower() not in self.commands:
+            return "Command is not available over the network."
+        loop = asyncio.get_running_loop()
+        if is_write_command(line):
+            await self.lock.acquire_write()
+            try:
+                return await loop.run_in_executor(None, self.execute_text, line)
+            finally:
+                await self.lock.release_write()
+        await self.lock.acquire_read()
+        try:
+            return await loop.run_in_executor(None, self.execute_text, line)
+        finally:
+            await self.lock.release_read()
+
+    async def handle_client(self, reader, writer):                                                  # Читає команди клієнта в чергу, поки вона не заповниться
+        queue = asyncio.Queue(self.max_pending)
+        worker = asyncio.create_task(self.process_client(queue, writer))
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:                                                                  # Занадто довгий рядок
+                    break
+                if not line:
+                    break
+                await queue.put(line.decode("utf-8", errors="replace").strip())
+        except ConnectionError:
+            pass
+        await queue.put(None)
+        await worker
+        if not writer.is_closing():
+            writer.close()
+
+    async def process_client(self, queue, writer):                                                  # Виконує команди клієнта по черзі й надсилає відповіді
+        closed = False
+        while True:
+            line = await queue.get()
+            if line is None:
+                return
+            if closed:                                                                              # Після виходу лише звільняємо чергу
+                continue
+            try:
+                result = await self.execute(line)
+            except Exception as e:                                                                  # Помилка однієї команди не повинна зупиняти обробку клієнта
+                result = f"Error: {type(e).__name__}: {e}"
+            try:
+                writer.write(frame_response("Good bye!" if result is None else result))
+                await writer.drain()                                                                # Не читаємо далі, поки клієнт не забере відповіді
+            except ConnectionError:
+                closed = True
+                continue
+            if result is None:
+                writer.close()                                                                      # Закриття з'єднання завершує і читання команд
+                closed = True
+
+async def run_server(address_book, address):                                                        # Запускає сервер і працює до переривання
+    server = BookServer(address_book)
+    if address.startswith("unix:"):
+        await server.start(path=address[len("unix:"):])
+    else:
+        host, _, port = address.rpartition(":")
+        await server.start(host or "127.0.0.1", int(port))
+    print(f"Serving address book on {address}")
+    async with server.server:
+        await server.server.serve_forever()
+
+def main(argv=None):    
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] == ["--metrics"]:                                                                   # --metrics FILE: збирати статистику й періодично писати її у файл
+        metrics.dump_path = argv[1]
+        metrics.enabled = True
+        argv = argv[2:]
+    address_book = AddressBook(JournalStorage("address_book"))                                      # Контакти зберігаються між запусками
+    if argv and argv[0] == "--serve":                                                               # Режим сервера: --serve [host:port | unix:/path]
+        if (os.cpu_count() or 1) > 1:
+            scan_pool(os.cpu_count())                                                               # Пул для parallel_scan створюється до потоків сервера
+        try:
+            asyncio.run(run_server(address_book, argv[1] if len(argv) > 1 else "127.0.0.1:8765"))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            address_book.storage.close()
+        return
+    if argv and argv[0] == "--batch" or not sys.stdin.isatty():                                     # Неінтерактивний режим: команди з файлу або зі stdin
+        path = argv[1] if len(argv) > 1 else "-"
+        try:
+            if path == "-":
+                run_batch(sys.stdin, address_book, sys.stdout)
+            else:
+                with open(path, encoding="utf-8") as file:
+                    run_batch(file, address_book, sys.stdout)
+        finally:
+            address_book.storage.close()
+        return
     print("Welcome to the assistant bot!")
     while True:        
         user_input = input("Enter a command: ")  
-        command, args = parse_input(user_input)  
-        
-        if command in ["close", "exit"]:
+        result = execute(user_input, address_book)
+        if result is None:
+            address_book.storage.close()
             print("Good bye!")  
             break
-        elif command == "hello":
-            print("How can I help you?")  
-        elif command == "add":                                                     
-            print(add_record(args, address_book))
-        elif command == "change":  
-            print(change_contact(args, address_book))
-        elif command == "phone":  
-            print(get_phone(args, address_book))
-        elif command == "all_contacts":  
-            show_all_contacts(address_book)
-        elif command == "add_birthday":
-            print(add_birthday(args, address_book))
-        elif command == "search_records":  
-            print(search_records(args, address_book))
-        elif command == "add_record":  
-            print(add_record(args, address_book))
-        elif command == "show_birthday":
-            print(show_birthday(args, address_book))
-        elif command == "delete_contact_by_name":
-            print(delete_contact_by_name(args, address_book))
-        elif command == "delete_contact_by_phone":
-            print(delete_contact_by_phone(args, address_book))
-        elif command == "get_upcoming_birthdays":
-            address_book.show_upcoming_birthdays()
-        elif command == "help":  
-            show_available_commands()
-        else:            
-            print("Invalid command.")  
+        write_result(result, sys.stdout)
 
 
 class Field:                                                                                         # Базовий клас для полів запису контакту
+    __slots__ = ("name", "value")                                                                   # Без __dict__, щоб мільйони записів займали менше пам'яті
+
     def __init__(self, name, value):
         self.name = name
         self.value = value
@@ -281,107 +799,1019 @@ class Field:
 
 
 class Name(Field):                                                                                  # Клас для зберігання імені контакту
+    __slots__ = ()
+
     def __init__(self, name):
         super().__init__("Name", name)
 
 
-class Phone:                                                                                        # Клас для зберігання номера телефону контакту
-    def __init__(self, phone_number):
-        self.value = phone_number
-        self.validate_phone()
+class Phone(int):                                                                                   # Клас для зберігання номера телефону контакту
+    __slots__ = ()                                                                                  # Номер зберігається як ціле число: дешеве порівняння й хешування
 
-    def validate_phone(self):                                                                       # Перевіряє правильність формату номера телефону                                        
-        if len(self.value) != 10 or not self.value.isdigit():
+    def __new__(cls, phone_number):                                                                 # Нормалізує номер: прибирає роздільники і вимагає рівно 10 цифр
+        if isinstance(phone_number, int):
+            if not 0 <= phone_number < 10 ** 10:
+                raise ValueError("Phone number must be exactly 10 digits.")
+            return super().__new__(cls, phone_number)
+        digits = str(phone_number).translate(PHONE_SEPARATORS)
+        if len(digits) != 10 or not digits.isascii() or not digits.isdigit():
             raise ValueError("Phone number must be exactly 10 digits.")
+        return super().__new__(cls, int(digits))
+
+    def __str__(self):                                                                              # Повертає номер з провідними нулями
+        return f"{int(self):010d}"
 
-    def set_value(self, phone_number):                                                              # Встановлює нове значення номера телефону
-        self.value = phone_number        
-        self.validate_phone()
+    def __repr__(self):
+        return f"Phone('{self}')"
 
     def get_value(self):                                                                            # Повертає поточне значення номера телефону                                               
-        return self.value
+        return str(self)
+
+    value = property(get_value)
+
+def normalize_phone(phone_number):                                                                  # Повертає Phone або None, якщо номер некоректний
+    try:
+        return Phone(phone_number)
+    except ValueError:
+        return None
 
 from datetime import datetime
 
 class Birthday(Field):                                                                              # Клас для зберігання дати народження контакту
+    __slots__ = ("ordinal", "text")                                                                 # Дата зберігається як порядковий номер дня, а не як datetime
+
     def __init__(self, value):
-        try:
-            self.set_value(value)
-        except ValueError:
-            raise ValueError("Invalid date format. Use DD-MM-YYYY")
+        self.set_value(value)
 
-    def set_value(self, value):
-        try:
-            self.value = datetime.strptime(value, '%d-%m-%Y')
-        except ValueError:
-            raise ValueError("Invalid date format. Use DD-MM-YYYY")
+    def set_value(self, value):                                                                     # Розбирає DD-MM-YYYY без strptime; рядок у форматі DD-MM-YYYY запам'ятовується
+        self.ordinal = birthday_ordinal(value)
+        self.text = value if len(value) == 10 else None
 
-    def get_value(self):
-        return self.value
+    def __str__(self):                                                                              # Повертає дату у форматі DD-MM-YYYY, форматуючи її лише один раз
+        if self.text is None:
+            value = datetime.fromordinal(self.ordinal)
+            self.text = f"{value.day:02d}-{value.month:02d}-{value.year:04d}"
+        return self.text
+
+    def get_value(self):                                                                            # Відновлює datetime з порядкового номера дня
+        return datetime.fromordinal(self.ordinal)
+
+    @staticmethod
+    def from_ordinal(ordinal):                                                                      # Створює дату народження з порядкового номера дня без розбору рядка
+        birthday = Birthday.__new__(Birthday)
+        birthday.ordinal = ordinal
+        birthday.text = None                                                                        # Рядок буде сформовано при першому виведенні
+        return birthday
+
+    value = property(get_value)
 
 class Record:                                                                                       # Клас для зберігання запису контакту
+    __slots__ = ("name", "phones", "birthday", "book")
+
     def __init__(self, name):                                                                       # Ініціалізує об'єкт запису контакту з ім'ям
         self.name = Name(name)
         self.phones = []
         self.birthday = None
+        self.book = None                                                                            # Адресна книга, індекси якої треба оновлювати
     
     @input_error
     def add_birthday(self, date):                                                                   # Додає дату народження до запису контакту
         if not date:
             return "Invalid birthday format. Please provide a valid date."
         try:
-            self.birthday = Birthday(date)
-            return "Birthday added."
+            birthday = Birthday(date)
         except ValueError as e:
             return str(e)
+        if self.book:
+            self.book.remember(self.name.get_value())
+        if self.book and self.birthday:
+            self.book.unindex_birthday(self.name.get_value(), self.birthday)
+        self.birthday = birthday
+        if self.book:
+            self.book.index_birthday(self.name.get_value(), self.birthday)
+            self.book.log("birthday", self.name.get_value(), self.get_birthday())
+        return "Birthday added."
     
     def edit_birthday(self, date):                                                                  # Редагує дату народження в записі контакту                                                
         try:
-            datetime.strptime(date, '%d-%m-%Y')
+            birthday = Birthday(date)
         except ValueError:
             raise ValueError("Incorrect date format, should be DD-MM-YYYY.")
-        self.birthday.set_date(date)
+        if self.book:
+            self.book.remember(self.name.get_value())
+        if self.book and self.birthday:
+            self.book.unindex_birthday(self.name.get_value(), self.birthday)
+        self.birthday = birthday
+        if self.book:
+            self.book.index_birthday(self.name.get_value(), self.birthday)
+            self.book.log("birthday", self.name.get_value(), self.get_birthday())
 
     def get_birthday(self):                                                                         # Повертає дату народження з запису контакту
         if self.birthday:
-            return self.birthday.get_value().strftime('%d-%m-%Y')
+            return str(self.birthday)
         else:
             return None
         
     def add_phone(self, phone_number):                                                              # Додає номер телефону до запису контакту                                  
-        if not re.match(r'^\d{10}$', phone_number):
-            raise ValueError("Phone number must be a 10-digit number.")
+        phone_number = Phone(phone_number)
+        if self.book:
+            self.book.remember(self.name.get_value())
         self.phones.append(phone_number)
+        if self.book:
+            self.book.index_phone(phone_number, self.name.get_value())
+            self.book.log("phones", self.name.get_value(), self.phones)
     
 
     def remove_phone(self, phone_number):                                                           # Видаляє номер телефону з запису контакту                                      
-        for phone in self.phones:
-            if phone.get_value() == phone_number:
-                self.phones.remove(phone)
-                return "Phone number removed."
+        phone_number = normalize_phone(phone_number)
+        if phone_number in self.phones:
+            if self.book:
+                self.book.remember(self.name.get_value())
+            self.phones.remove(phone_number)
+            if self.book:
+                self.book.unindex_phone(phone_number, self.name.get_value())
+                self.book.log("phones", self.name.get_value(), self.phones)
+            return "Phone number removed."
         return "Phone number not found."
 
     def edit_phone(self, old_phone_number, new_phone_number):                                       # Редагує номер телефону в запису контакту                  
-        for phone in self.phones:
-            if phone.get_value() == old_phone_number:
-                try:
-                    phone.set_value(new_phone_number)
-                    return "Phone number updated."
-                except ValueError as e:
-                    return str(e)
-        return "Phone number not found."
+        old_phone_number = normalize_phone(old_phone_number)
+        if old_phone_number not in self.phones:
+            return "Phone number not found."
+        try:
+            new_phone_number = Phone(new_phone_number)
+        except ValueError as e:
+            return str(e)
+        if self.book:
+            self.book.remember(self.name.get_value())
+        self.phones[self.phones.index(old_phone_number)] = new_phone_number
+        if self.book:
+            self.book.unindex_phone(old_phone_number, self.name.get_value())
+            self.book.index_phone(new_phone_number, self.name.get_value())
+            self.book.log("phones", self.name.get_value(), self.phones)
+        return "Phone number updated."
 
     def find_phone(self, phone_number):                                                             # Знаходить номер телефону в записі контакту                                      
-        for phone in self.phones:
-            if phone.get_value() == phone_number:
-                return "Phone number found."
+        if normalize_phone(phone_number) in self.phones:
+            return "Phone number found."
         return "Phone number not found."
 
 from datetime import datetime, timedelta
+import calendar
+from array import array
+
+class PhoneSuffixIndex:                                                                             # Відсортовані суфікси номерів для пошуку "закінчується на" і "містить"
+    CHUNK = 1000                                                                                    # Розмір блоку: вставка зсуває лише один блок, а не весь масив
+    FILTER_RATIO = 32                                                                               # Прохід по всьому індексу дешевший за ~32 окремі видалення на кожен запис
+
+    def __init__(self):
+        self.chunks = []                                                                            # Блоки (суфікси, номери), упорядковані за парою (суфікс, номер)
+        self.maxes = []                                                                             # Остання пара кожного блоку як суфікс * 10**10 + номер
+
+    SUFFIX_SCALES = [(10 ** length, 10 ** (10 - length) * 11, length) for length in range(1, 11)]
+
+    @staticmethod
+    def suffix_keys(phone):                                                                         # Кодує всі суфікси номера числами, порядок яких збігається з порядком рядків
+        return [phone % modulus * scale + length for modulus, scale, length in PhoneSuffixIndex.SUFFIX_SCALES] # Суфікс довжини length, доповнений нулями справа
+
+    @staticmethod
+    def locate(keys, phones, key, phone):                                                           # Позиція пари в блоці: серед однакових суфіксів номери відсортовані
+        low = bisect.bisect_left(keys, key)
+        high = bisect.bisect_right(keys, key, low)
+        return bisect.bisect_left(phones, phone, low, high)
+
+    def insert(self, key, phone):                                                                   # Вставляє одну пару (суфікс, номер) у відповідний блок
+        if not self.chunks:
+            self.chunks.append((array("q", [key]), array("q", [phone])))
+            self.maxes.append(key * 10 ** 10 + phone)
+            return
+        c = min(bisect.bisect_left(self.maxes, key * 10 ** 10 + phone), len(self.chunks) - 1)
+        keys, phones = self.chunks[c]
+        i = self.locate(keys, phones, key, phone)
+        keys.insert(i, key)
+        phones.insert(i, phone)
+        self.maxes[c] = keys[-1] * 10 ** 10 + phones[-1]
+        if len(keys) > 2 * self.CHUNK:
+            self.chunks[c:c + 1] = [(keys[:self.CHUNK], phones[:self.CHUNK]), (keys[self.CHUNK:], phones[self.CHUNK:])]
+            self.maxes[c:c + 1] = [keys[self.CHUNK - 1] * 10 ** 10 + phones[self.CHUNK - 1], self.maxes[c]]
+
+    def add(self, phone):                                                                           # Додає всі суфікси номера
+        for key in self.suffix_keys(phone):
+            self.insert(key, phone)
+
+    def split(self, keys, phones):                                                                  # Ділить відсортовані масиви на блоки; повертає (блоки, останні пари блоків)
+        chunks = []
+        maxes = []
+        for start in range(0, len(keys), self.CHUNK):
+            chunks.append((keys[start:start + self.CHUNK], phones[start:start + self.CHUNK]))
+            end = min(start + self.CHUNK, len(keys)) - 1
+            maxes.append(keys[end] * 10 ** 10 + phones[end])
+        return chunks, maxes
+
+    def add_many(self, phones):                                                                     # Додає багато номерів, зливаючи їх лише з тими блоками, куди вони потрапляють
+        entries = sorted((phone % modulus * scale + length) * 10 ** 10 + phone for phone in phones for modulus, scale, length in self.SUFFIX_SCALES) # Пара одним числом, як у maxes: числа сортуються втричі швидше за кортежі
+        if len(entries) <= self.CHUNK:                                                              # Невеликий пакет (відкат, повтор, хвіст журналу) дешевше вставити по одному
+            for entry in entries:
+                self.insert(*divmod(entry, 10 ** 10))
+            return
+        if not self.chunks:
+            self.chunks, self.maxes = self.split(*self.unpack(entries))
+            return
+        chunks = []
+        maxes = []
+        start = 0
+        for c, chunk in enumerate(self.chunks):
+            keys, phones = chunk
+            end = len(entries) if c == len(self.chunks) - 1 else bisect.bisect_right(entries, self.maxes[c], start)
+            group = entries[start:end]                                                              # Пари, що потрапляють у цей блок
+            start = end
+            if not group:
+                chunks.append(chunk)
+                maxes.append(self.maxes[c])
+                continue
+            if len(group) * 8 > len(keys):                                                          # Великий пакет дешевше злити сортуванням, ніж вставляти по одному
+                keys, phones = self.unpack(sorted(itertools.chain([key * 10 ** 10 + phone for key, phone in zip(keys, phones)], group)))
+                chunk = (keys, phones)
+            else:
+                for entry in group:
+                    key, phone = divmod(entry, 10 ** 10)
+                    i = self.locate(keys, phones, key, phone)
+                    keys.insert(i, key)
+                    phones.insert(i, phone)
+            merged, merged_maxes = self.split(keys, phones) if len(keys) > 2 * self.CHUNK else ([chunk], [keys[-1] * 10 ** 10 + phones[-1]])
+            chunks.extend(merged)
+            maxes.extend(merged_maxes)
+        self.chunks = chunks
+        self.maxes = maxes
+
+    @staticmethod
+    def unpack(entries):                                                                            # Розкладає відсортовані числа суфікс * 10**10 + номер на масиви суфіксів і номерів
+        return array("q", [entry // 10 ** 10 for entry in entries]), array("q", [entry % 10 ** 10 for entry in entries])
+
+    def remove(self, phone):                                                                        # Прибирає всі суфікси номера
+        for key in self.suffix_keys(phone):
+            c = bisect.bisect_left(self.maxes, key * 10 ** 10 + phone)
+            if c == len(self.chunks):
+                continue
+            keys, phones = self.chunks[c]
+            i = self.locate(keys, phones, key, phone)
+            if i == len(keys) or keys[i] != key or phones[i] != phone:
+                continue
+            del keys[i]
+            del phones[i]
+            if keys:
+                self.maxes[c] = keys[-1] * 10 ** 10 + phones[-1]
+            else:
+                del self.chunks[c]
+                del self.maxes[c]
+
+    def remove_many(self, phones):                                                                  # Прибирає багато номерів: великий пакет — одним фільтром по всіх блоках
+        if len(phones) * len(self.SUFFIX_SCALES) * self.FILTER_RATIO < len(self.chunks) * self.CHUNK:
+            for phone in phones:
+                self.remove(phone)
+            return
+        gone = set(phones)
+        chunks = []
+        maxes = []
+        for keys, numbers in self.chunks:
+            kept = [number not in gone for number in numbers]                                       # Усі суфікси номера зникають разом, тож досить перевірити номер
+            keys = array("q", itertools.compress(keys, kept))
+            numbers = array("q", itertools.compress(numbers, kept))
+            if keys:
+                chunks.append((keys, numbers))
+                maxes.append(keys[-1] * 10 ** 10 + numbers[-1])
+        self.chunks = chunks
+        self.maxes = maxes
+
+    def search(self, digits, mode="contains", limit=None):                                          # Повертає номери, що містять digits або закінчуються на них
+        if not 0 < len(digits) <= 10 or not digits.isdigit():
+            return []
+        if mode == "ends":
+            low = high = int(digits.ljust(10, "0")) * 11 + len(digits)
+        else:
+            low = int(digits.ljust(10, "0")) * 11
+            high = int(digits.ljust(10, "9")) * 11 + 10
+        found = set()
+        for c in range(bisect.bisect_left(self.maxes, low * 10 ** 10), len(self.chunks)):
+            keys, phones = self.chunks[c]
+            start = bisect.bisect_left(keys, low)
+            end = bisect.bisect_right(keys, high, start)
+            for i in range(start, end):
+                if keys[i] % 11 >= len(digits):                                                     # Коротші суфікси могли збігтися лише завдяки доповненню нулями
+                    found.add(phones[i])
+                    if len(found) == limit:                                                         # Досить номерів — решту блоків не переглядаємо
+                        return sorted(found)
+            if end < len(keys):
+                break
+        return sorted(found)
+
+def trigrams_of(text):                                                                              # Повертає множину триграм рядка
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+class SearchIndex:                                                                                  # Індекс для пошуку за префіксом і підрядком (імена та телефони)
+    DENSE_RATIO = 64                                                                                # Якщо найменша множина триграм більша за 1/64 ключів, збіги йдуть щільно
+    INSORT_LIMIT = 512                                                                              # Менші пакети вставляються по одному: пересортування коштує як сотні вставок
+
+    def __init__(self):
+        self.keys = []                                                                              # Відсортовані пари (текст, ім'я контакту)
+        self.folded_keys = []                                                                       # Ті самі пари з текстом у нижньому регістрі
+        self.digit_keys = []                                                                        # Відсортовані пари з текстом лише з цифр (телефони): регістру не мають
+        self.trigrams = {}                                                                          # Триграма -> множина пар (текст, ім'я контакту)
+
+    def lists_for(self, text):                                                                      # Повертає (ключі, ключі в нижньому регістрі), куди потрапляє текст
+        if text.isdigit():
+            return self.digit_keys, self.digit_keys
+        return self.keys, self.folded_keys
+
+    def add(self, text, name):                                                                      # Додає текст ключа для контакту
+        key = (text, name)                                                                          # Один кортеж спільний для всіх структур індексу
+        folded = text.lower()
+        keys, folded_keys = self.lists_for(text)
+        bisect.insort(keys, key)
+        if folded_keys is not keys:
+            bisect.insort(folded_keys, key if folded == text else (folded, name))
+        for trigram in trigrams_of(folded):
+            self.trigrams.setdefault(trigram, set()).add(key)
+
+    def add_many(self, pairs):                                                                      # Додає багато ключів одразу, сортуючи списки лише один раз
+        keys = []
+        folded_keys = []
+        digit_keys = []
+        for text, name in pairs:
+            key = (text, name)
+            folded = text.lower()
+            if text.isdigit():
+                digit_keys.append(key)
+            else:
+                keys.append(key)
+                folded_keys.append(key if folded == text else (folded, name))
+            for trigram in trigrams_of(folded):
+                self.trigrams.setdefault(trigram, set()).add(key)
+        for target, new in ((self.keys, keys), (self.folded_keys, folded_keys), (self.digit_keys, digit_keys)):
+            if len(new) <= self.INSORT_LIMIT:
+                for key in new:
+                    bisect.insort(target, key)
+            else:
+                target.extend(new)
+                target.sort()
+
+    def remove_many(self, pairs):                                                                   # Прибирає багато ключів одразу: великий пакет — одним проходом по списках
+        if len(pairs) <= self.INSORT_LIMIT:
+            for text, name in pairs:
+                self.remove(text, name)
+            return
+        removed = set()
+        for text, name in pairs:
+            folded = text.lower()
+            removed.add((text, name))
+            removed.add((folded, name))
+            for trigram in trigrams_of(folded):
+                entries = self.trigrams.get(trigram)
+                if entries:
+                    entries.discard((text, name))
+                    if not entries:
+                        del self.trigrams[trigram]
+        for keys in (self.keys, self.folded_keys, self.digit_keys):
+            keys[:] = [key for key in keys if key not in removed]                                   # Пари містять ім'я контакту, тож чужих ключів не зачіпають
+
+    def remove(self, text, name):                                                                   # Прибирає текст ключа для контакту
+        keys, folded_keys = self.lists_for(text)
+        targets = ((keys, (text, name)),) if folded_keys is keys else ((keys, (text, name)), (folded_keys, (text.lower(), name)))
+        for keys, key in targets:
+            i = bisect.bisect_left(keys, key)
+            if i < len(keys) and keys[i] == key:
+                del keys[i]
+        for trigram in trigrams_of(text.lower()):
+            entries = self.trigrams.get(trigram)
+            if entries:
+                entries.discard((text, name))
+                if not entries:
+                    del self.trigrams[trigram]
+
+    def sources(self, term, ignore_case):                                                           # Списки ключів, у яких може знайтися term: текст з літерами не входить у телефон
+        sources = [self.folded_keys if ignore_case else self.keys]
+        if not term or term.isdigit():
+            sources.append(self.digit_keys)
+        return sources
+
+    def iter_keys(self, start=None, ignore_case=False, term=""):                                    # Генерує ключі всіх потрібних списків у спільному порядку, починаючи з start
+        def walk(keys):
+            i = bisect.bisect_left(keys, start) if start else 0
+            while i < len(keys):
+                yield keys[i]
+                i += 1
+        sources = self.sources(term, ignore_case)
+        if len(sources) == 1:
+            return walk(sources[0])
+        return heapq.merge(*map(walk, sources))
+
+    def iter_matches(self, term, mode, ignore_case):                                                # Генерує імена контактів, ключі яких відповідають запиту
+        if ignore_case:
+            term = term.lower()
+        if mode in ("exact", "prefix"):
+            for text, name in self.iter_keys((term, ""), ignore_case, term):
+                if not text.startswith(term) or mode == "exact" and text != term:
+                    return
+                yield name
+            return
+        if len(term) >= 3:
+            sets = sorted((self.trigrams.get(t, set()) for t in trigrams_of(term.lower())), key=len)
+            if len(sets[0]) * self.DENSE_RATIO < len(self.keys) + len(self.digit_keys):             # Рідкісний запит: кандидатів мало, їх дешево перетнути й відсортувати
+                candidates = set.intersection(*sets)
+                if ignore_case:
+                    candidates = [(text.lower(), name) for text, name in candidates]
+                for text, name in sorted(candidates):
+                    if term in text:
+                        yield name
+                return
+        for text, name in self.iter_keys(None, ignore_case, term):                                  # Частий або короткий запит: збіги щільні, тож обхід по порядку швидко набирає ліміт
+            if term in text:
+                yield name
+
+    def search(self, term, mode="substring", ignore_case=False, limit=None, offset=0):              # Повертає сторінку унікальних імен контактів, що відповідають запиту
+        if mode not in ("exact", "prefix", "substring"):
+            raise ValueError(f"Unknown search mode '{mode}'.")
+        names = []
+        seen = set()
+        for name in self.iter_matches(term, mode, ignore_case):
+            if name in seen:
+                continue
+            seen.add(name)
+            if len(seen) > offset:
+                names.append(name)
+                if limit is not None and len(names) >= limit:
+                    break
+        return names
+
+FEB_29 = 59                                                                                         # Номер дня 29 лютого у високосному році (з нуля)
+
+import mmap
+
+class Storage:                                                                                      # Базовий клас сховища адресної книги (нічого не зберігає)
+    def load(self, book):                                                                           # Завантажує збережені контакти в адресну книгу
+        pass
+
+    def append(self, op, *args):                                                                    # Записує одну зміну адресної книги
+        pass
+
+    def append_many(self, ops):                                                                     # Записує пакет змін адресної книги
+        for op in ops:
+            self.append(*op)
+
+    def close(self):                                                                                # Закриває сховище
+        pass
+
+@contextlib.contextmanager
+def gc_paused():                                                                                    # Вимикає збирач сміття, поки створюються сотні тисяч довгоживучих об'єктів
+    collecting = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if collecting:
+            gc.enable()
+
+class JournalStorage(Storage):                                                                      # Сховище у вигляді знімка та журналу змін, що лише дописується
+    def __init__(self, path, compact_every=10000, fsync=False):
+        self.snapshot_path = path + ".snapshot"
+        self.journal_path = path + ".journal"
+        self.old_journal_path = path + ".journal.old"                                               # Журнал, який зараз переноситься у знімок
+        self.compact_every = compact_every
+        self.fsync = fsync
+        self.seq = 0                                                                                # Номер останнього запису в журналі
+        self.pending = 0                                                                            # Кількість записів журналу з часу останнього знімка
+        self.lock = threading.Lock()
+        self.compactor = None
+        self.journal = None
+        self.book = None
+
+    def read_lines(self, path):                                                                     # Потоково читає рядки файлу через mmap
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            return
+        with open(path, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            for line in iter(data.readline, b""):
+                if line.endswith(b"\n"):                                                            # Недописаний останній рядок (збій під час запису) пропускаємо
+                    yield line
+
+    def read_batches(self, lines, size=10000):                                                      # Декодує рядки JSON пакетами: один виклик json.loads на size рядків
+        for batch in iter(lambda: list(itertools.islice(lines, size)), []):
+            yield json.loads(b"[" + b",".join(batch) + b"]")
+
+    def load(self, book):                                                                           # Завантажує знімок і дочитує лише хвіст журналу
+        self.book = book
+        snapshot_seq = 0
+        lines = self.read_lines(self.snapshot_path)
+        header = next(lines, None)
+        if header:
+            snapshot_seq = json.loads(header)["seq"]
+            with gc_paused():
+                for rows in self.read_batches(lines):
+                    book.restore_records(rows)
+        self.seq = snapshot_seq
+        added = []                                                                                  # Поспіль додані контакти відновлюються одним пакетом
+        for path in (self.old_journal_path, self.journal_path):
+            for seq, op, *args in itertools.chain.from_iterable(self.read_batches(self.read_lines(path))):
+                if seq > snapshot_seq:
+                    if op == "add":
+                        added.append(args)
+                    else:
+                        book.restore_records(added)
+                        added = []
+                        book.apply(op, args)
+                    self.seq = seq
+                    self.pending += 1
+        book.restore_records(added)
+        self.journal = open(self.journal_path, "a", encoding="utf-8")
+        if os.path.exists(self.old_journal_path):                                                   # Попереднє ущільнення не завершилось — завершуємо його зараз
+            self.compact(wait=True)
+
+    def append(self, op, *args):                                                                    # Дописує зміну в журнал
+        with self.lock:
+            self.seq += 1
+            self.journal.write(json.dumps([self.seq, op, *args], ensure_ascii=False) + "\n")
+            self.journal.flush()
+            if self.fsync:
+                os.fsync(self.journal.fileno())
+            self.pending += 1
+        if self.pending >= self.compact_every:
+            self.compact()
+
+    def append_many(self, ops):                                                                     # Дописує пакет змін у журнал одним записом
+        with self.lock:
+            lines = []
+            for op in ops:
+                self.seq += 1
+                lines.append(json.dumps([self.seq, *op], ensure_ascii=False) + "\n")
+            self.journal.write("".join(lines))
+            self.journal.flush()
+            if self.fsync:
+                os.fsync(self.journal.fileno())
+            self.pending += len(lines)
+        if self.pending >= self.compact_every:
+            self.compact()
+
+    def snapshot_rows(self):                                                                        # Знімає копію контактів для запису у знімок
+        return [(name, list(record.phones), record.birthday.ordinal if record.birthday else None) for name, record in self.book.data.items()]
+
+    def compact(self, wait=False):                                                                  # Згортає журнал у новий знімок (у фоновому потоці)
+        if self.compactor and self.compactor.is_alive():
+            if not wait:
+                return
+            self.compactor.join()
+        with self.lock:
+            if wait or os.path.exists(self.old_journal_path):
+                self.write_snapshot(self.snapshot_rows(), self.seq)
+                self.journal.truncate(0)
+                self.pending = 0
+                return
+            self.journal.close()
+            os.replace(self.journal_path, self.old_journal_path)
+            self.journal = open(self.journal_path, "a", encoding="utf-8")
+            self.pending = 0
+            rows, seq = self.snapshot_rows(), self.seq
+        self.compactor = threading.Thread(target=self.write_snapshot, args=(rows, seq), daemon=True)
+        self.compactor.start()
+
+    def write_snapshot(self, rows, seq):                                                            # Атомарно записує знімок і видаляє перенесений журнал
+        temp_path = self.snapshot_path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            file.write(json.dumps({"seq": seq}) + "\n")
+            for row in rows:
+                file.write(json.dumps(row, ensure_ascii=False) + "\n")
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, self.snapshot_path)
+        if os.path.exists(self.old_journal_path):
+            os.remove(self.old_journal_path)
+
+    def close(self):                                                                                # Дочікується фонового ущільнення і закриває журнал
+        if self.compactor:
+            self.compactor.join()
+        if self.journal:
+            self.journal.close()
+            self.journal = None
+
+def birthday_ordinal(text):                                                                         # Перетворює дату DD-MM-YYYY на порядковий номер дня
+    match = DATE_PATTERN.match(text)
+    if not match:
+        raise ValueError("Invalid date format. Use DD-MM-YYYY")
+    day, month, year = match.groups()
+    try:
+        return datetime(int(year), int(month), int(day)).toordinal()
+    except ValueError:
+        raise ValueError("Invalid date format. Use DD-MM-YYYY")
+
+def parse_contact_row(row):                                                                         # Розбирає рядок імпорту на (ім'я, телефони, день народження)
+    if isinstance(row, str):
+        try:
+            row = json.loads(row)
+        except ValueError as e:
+            raise ValueError(f"Invalid JSON: {e}")
+    if not isinstance(row, dict):
+        raise ValueError("Row must be a JSON object.")
+    name = str(row.get("name") or "").strip()
+    if not name:
+        raise ValueError("Name is missing.")
+    phones = row.get("phones") or row.get("phone") or []
+    if not isinstance(phones, list):
+        phones = str(phones).split(";")
+    phones = [str(phone).translate(PHONE_SEPARATORS) for phone in phones]
+    phones = [int(Phone(phone)) for phone in phones if phone]                                       # Та сама перевірка, що й у Phone; у пакеті передаємо прості числа
+    if not phones:
+        raise ValueError("Phone number is missing.")
+    birthday = row.get("birthday")
+    return name, list(phones), birthday_ordinal(str(birthday)) if birthday else None
+
+def validate_batch(batch):                                                                          # Перевіряє пакет рядків імпорту; повертає (коректні рядки, помилки)
+    parsed = []
+    errors = []
+    for number, row in batch:
+        try:
+            parsed.append((number, parse_contact_row(row)))
+        except (ValueError, AttributeError, TypeError) as e:
+            errors.append((number, str(e)))
+    return parsed, errors
+
+from concurrent.futures import ProcessPoolExecutor
+import collections
+
+PARALLEL_THRESHOLD = 50000                                                                          # Менші книги швидше сканувати в одному процесі
+
+def regex_scan(rows, pattern):                                                                      # Повертає імена контактів, ім'я або телефон яких відповідає регулярному виразу
+    regex = re.compile(pattern)
+    return [name for name, phones, _ in rows if regex.search(name) or any(regex.search(f"{phone:010d}") for phone in phones)]
+
+def birthday_month_counts(rows):                                                                    # Рахує дні народження по місяцях
+    counts = [0] * 12
+    for _, _, ordinal in rows:
+        if ordinal:
+            counts[datetime.fromordinal(ordinal).month - 1] += 1
+    return counts
+
+def sum_counts(parts):                                                                              # Об'єднує лічильники з різних частин книги
+    return [sum(column) for column in zip(*parts)]
+
+def concat_results(parts):                                                                          # Об'єднує списки результатів у порядку частин книги
+    return [item for part in parts for item in part]
+
+def book_rows(book):                                                                                # Генерує рядки (ім'я, телефони, порядковий номер дня народження) книги
+    return ((name, record.phones, record.birthday.ordinal if record.birthday else None) for name, record in book.data.items())
+
+import tempfile
+import weakref
+
+class ScanSnapshot:                                                                                 # Упакована копія книги у тимчасовому файлі, яку процеси пулу читають частинами
+    def __init__(self, book):
+        self.version = book.version
+        records = list(book.data.values())
+        names = [name.encode("utf-8") for name in book.data]
+        name_ends = array("q", itertools.accumulate(map(len, names)))
+        phone_ends = array("q", itertools.accumulate(len(record.phones) for record in records))
+        ordinals = array("q", [record.birthday.ordinal if record.birthday else 0 for record in records])
+        phones = array("q", itertools.chain.from_iterable(record.phones for record in records))
+        descriptor, self.path = tempfile.mkstemp(prefix="address_book_scan_")
+        with open(descriptor, "wb") as file:                                                        # Заголовок: кількість контактів і номерів, далі масиви та імена
+            for part in (array("q", [len(names), len(phones)]), name_ends, phone_ends, ordinals, phones):
+                file.write(part)
+            file.write(b"".join(names))
+        self.size = len(names)
+        weakref.finalize(self, os.remove, self.path)                                                # Файл прибирається разом зі знімком або при виході
+
+def snapshot_rows(path, start, end):                                                                # Читає контакти start..end зі знімка: копіює лише свою частину файла
+    with open(path, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        count, total = array("q", data[:16])
+        first = max(start - 1, 0)                                                                   # Кінець попереднього запису — початок першого в частині
+        def column(offset, low, high):
+            return array("q", data[16 + 8 * (offset + low):16 + 8 * (offset + high)])
+        name_ends = column(0, first, end)
+        phone_ends = column(count, first, end)
+        ordinals = column(2 * count, start, end)
+        name_low = name_ends[0] if start else 0
+        phone_low = phone_ends[0] if start else 0
+        phones = column(3 * count, phone_low, phone_ends[-1])
+        base = 16 + 8 * (3 * count + total)
+        names = data[base + name_low:base + name_ends[-1]]
+    shift = 1 if start else 0
+    name_position = phone_position = 0
+    for i in range(end - start):
+        name_end = name_ends[i + shift] - name_low
+        phone_end = phone_ends[i + shift] - phone_low
+        yield names[name_position:name_end].decode("utf-8"), phones[phone_position:phone_end], ordinals[i] or None
+        name_position, phone_position = name_end, phone_end
+
+def run_range(task, path, start, end, params):                                                      # Виконує task над частиною знімка в процесі пулу
+    return task(snapshot_rows(path, start, end), *params)
+
+scan_snapshots = weakref.WeakKeyDictionary()                                                        # Книга -> її останній знімок; новий будується лише після змін
+scan_lock = threading.Lock()
+
+def book_snapshot(book):                                                                            # Повертає актуальний знімок книги, перебудовуючи його після змін
+    with scan_lock:
+        snapshot = scan_snapshots.get(book)
+        if snapshot is None or snapshot.version != book.version:
+            snapshot = scan_snapshots[book] = ScanSnapshot(book)
+        return snapshot
+
+scan_pools = {}                                                                                     # Пули процесів для parallel_scan за кількістю процесів — створюються один раз
+
+def scan_pool(workers):                                                                             # Повертає пул на workers процесів, створюючи його за першого виклику
+    with scan_lock:
+        pool = scan_pools.get(workers)
+        if pool is None:
+            pool = scan_pools[workers] = ProcessPoolExecutor(workers)
+            pool.submit(int).result()                                                               # Процеси створюються одразу, поки процес ще не має інших потоків
+    return pool
+
+def parallel_scan(book, task, params=(), merge=concat_results, workers=None, threshold=PARALLEL_THRESHOLD): # Виконує task над усіма контактами, ділячи книгу на частини між процесами
+    workers = workers or os.cpu_count() or 1
+    if len(book.data) < threshold or workers < 2:
+        return task(book_rows(book), *params)
+    pool = scan_pool(workers)
+    snapshot = book_snapshot(book)
+    size = -(-snapshot.size // workers)
+    bounds = [(start, min(start + size, snapshot.size)) for start in range(0, snapshot.size, size)] # Суцільні частини зберігають порядок книги при об'єднанні
+    parts = list(pool.map(run_range, [task] * len(bounds), [snapshot.path] * len(bounds), *zip(*bounds), [params] * len(bounds)))
+    return merge(parts)
+
+def bounded_map(executor, func, items, window):                                                     # Як executor.map, але тримає в роботі не більше window завдань
+    pending = collections.deque()
+    for item in items:
+        pending.append(executor.submit(func, item))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+def iter_batches(rows, batch_size):                                                                 # Ділить потік рядків на пронумеровані пакети
+    batch = []
+    for number, row in enumerate(rows, 1):
+        batch.append((number, row))
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+MONTH_STARTS = list(itertools.accumulate((calendar.monthrange(2000, month)[1] for month in range(1, 12)), initial=0)) # Номер першого дня кожного місяця у високосному році
+
+def birthday_key(month, day):                                                                       # Повертає номер дня року (0-365) для дня народження
+    return MONTH_STARTS[month - 1] + day - 1
+
+from datetime import date
+
+def next_occurrence(birthday, after):                                                               # Повертає найближчу дату дня народження, не раніше за after
+    value = date.fromordinal(birthday.ordinal)
+    for year in (after.year, after.year + 1):
+        day = value.day
+        if value.month == 2 and day == 29 and not calendar.isleap(year):
+            day = 28                                                                                # У невисокосний рік 29 лютого святкуємо 28-го
+        occurrence = date(year, value.month, day)
+        if occurrence >= after:
+            return occurrence
+
+class BirthdayScheduler:                                                                            # Купа найближчих днів народження, яку книга оновлює при кожній зміні
+    def __init__(self, book, clock=None, days_ahead=0):
+        self.book = book
+        self.clock = clock or date.today                                                            # Функція, що повертає поточну дату; у тестах її можна підмінити
+        self.days_ahead = days_ahead                                                                # За скільки днів до свята нагадувати
+        self.next = {}                                                                              # Ім'я -> дата, на яку зараз заплановано нагадування
+        self.heap = []                                                                              # Пари (дата, ім'я); застарілі пари пропускаються при виборці
+        self.processed = self.clock() - timedelta(days=1)                                           # Останній день, нагадування до якого due() вже видав
+        start = self.first_day()
+        for name, record in book.data.items():
+            if record.birthday:
+                self.next[name] = next_occurrence(record.birthday, start)
+        self.heap = [(occurrence, name) for name, occurrence in self.next.items()]
+        heapq.heapify(self.heap)
+
+    def horizon(self):                                                                              # Останній день, нагадування про який вже треба видати
+        return self.clock() + timedelta(days=self.days_ahead)
+
+    def first_day(self):                                                                            # Перший день, нагадування за який ще не видавалося
+        return max(self.processed + timedelta(days=1), self.clock())
+
+    def add(self, name, birthday):                                                                  # Планує нагадування для нового або зміненого дня народження
+        occurrence = next_occurrence(birthday, self.first_day())                                    # Вже видане нагадування не повторюється після редагування чи скасування
+        self.next[name] = occurrence
+        heapq.heappush(self.heap, (occurrence, name))
+        self.compact()
+
+    def remove(self, name):                                                                         # Скасовує нагадування; пара в купі видаляється ліниво
+        self.next.pop(name, None)
+        self.compact()
+
+    def compact(self):                                                                              # Перебудовує купу, коли застарілих пар стає більше, ніж актуальних
+        if len(self.heap) > 2 * len(self.next) + 16:
+            self.heap = [(occurrence, name) for name, occurrence in self.next.items()]
+            heapq.heapify(self.heap)
+
+    def peek(self):                                                                                 # Повертає (дата, ім'я) найближчого нагадування або None
+        while self.heap and self.next.get(self.heap[0][1]) != self.heap[0][0]:
+            heapq.heappop(self.heap)
+        return self.heap[0] if self.heap else None
+
+    def due(self):                                                                                  # Видає (дата, ім'я) для всіх нагадувань, час яких настав, і переносить їх на наступний рік
+        horizon = self.horizon()
+        self.processed = max(self.processed, horizon)
+        while True:
+            entry = self.peek()
+            if entry is None or entry[0] > horizon:
+                return
+            occurrence, name = heapq.heappop(self.heap)
+            following = next_occurrence(self.book.data[name].birthday, horizon + timedelta(days=1))
+            self.next[name] = following
+            heapq.heappush(self.heap, (following, name))
+            metrics.touch()
+            yield occurrence, name
+
+    def watch(self, interval=60, sleep=time.sleep):                                                 # Нескінченно видає нагадування, перевіряючи купу кожні interval секунд
+        while True:
+            yield from self.due()
+            sleep(interval)
 
 class AddressBook:                                                                                  # Клас для зберігання адресної книги контактів.
-    def __init__(self):                                                                             # Ініціалізує об'єкт адресної книги з порожнім словником контактів
+    def __init__(self, storage=None, undo_limit=100):                                               # Ініціалізує об'єкт адресної книги з порожнім словником контактів
         self.data = {}                                                             
+        self.phone_index = {}                                                                       # Зворотний індекс: номер телефону -> список імен
+        self.birthday_index = [set() for _ in range(366)]                                           # Індекс днів народження: день року -> множина імен
+        self.search_index = None                                                                    # Індекс для пошуку за іменами та телефонами; будується за першим запитом
+        self.suffix_index = None                                                                    # Індекс для пошуку за частиною номера; будується разом з search_index
+        self.index_lock = threading.Lock()
+        self.scheduler = None                                                                       # Планувальник нагадувань, створюється на вимогу
+        self.changes = None                                                                         # Стан змінених контактів до початку поточної транзакції
+        self.version = 0                                                                            # Лічильник змін: за ним перевіряється актуальність знімка для parallel_scan
+        self.pending_log = None                                                                     # Записи журналу, відкладені до завершення транзакції
+        self.undo_log = collections.deque(maxlen=undo_limit)                                        # Останні транзакції: ім'я -> (стан до, стан після)
+        self.redo_log = []
+        self.storage = None
+        if storage:
+            storage.load(self)
+        self.storage = storage                                                                      # Під час завантаження зміни в журнал не пишемо
+
+    def log(self, op, *args):                                                                       # Передає зміну адресної книги у сховище
+        if self.pending_log is not None:
+            self.pending_log.append((op, *[list(arg) if isinstance(arg, list) else arg for arg in args]))
+        elif self.storage:
+            self.storage.append(op, *args)
+
+    def log_many(self, ops):                                                                        # Передає пакет змін у сховище одним записом
+        if self.pending_log is not None:
+            self.pending_log.extend(ops)
+        elif self.storage and ops:
+            self.storage.append_many(ops)
+
+    def state(self, name):                                                                          # Повертає (телефони, порядковий номер дня народження) контакту або None
+        record = self.data.get(name)
+        if record is None:
+            return None
+        return list(record.phones), record.birthday.ordinal if record.birthday else None
+
+    def remember(self, name):                                                                       # Запам'ятовує стан контакту перед першою зміною в транзакції
+        self.version += 1                                                                           # Кожна зміна контакту проходить через remember
+        if self.changes is not None and name not in self.changes:
+            self.changes[name] = self.state(name)
+
+    def put_states(self, states):                                                                   # Повертає контакти до збережених станів, оновлюючи індекси одним пакетом
+        changes, self.changes = self.changes, None                                                  # Відновлення не записується як нова зміна
+        removed = self.remove_records(states)
+        rows = [(name, *state) for name, state in states.items() if state]
+        self.restore_records(rows)
+        self.log_many([("delete", name) for name in removed] + [("add", *row) for row in rows])
+        self.changes = changes
+
+    @contextlib.contextmanager
+    def transaction(self):                                                                          # Групує зміни: журнал пишеться одним пакетом, а при помилці все відкочується
+        if self.changes is not None:                                                                # Вкладена транзакція стає частиною зовнішньої
+            yield self
+            return
+        self.changes = {}
+        self.pending_log = []
+        try:
+            yield self
+        except BaseException:
+            changes, self.changes = self.changes, None
+            self.put_states(changes)
+            self.pending_log = None
+            raise
+        changes, ops = self.changes, self.pending_log
+        self.changes = self.pending_log = None
+        self.log_many(ops)
+        entry = {}
+        for name, before in changes.items():
+            after = self.state(name)
+            if after != before:
+                entry[name] = (before, after)
+        if entry:
+            self.undo_log.append(entry)
+            self.redo_log.clear()
+
+    def undo(self):                                                                                 # Скасовує останню транзакцію; повертає False, якщо скасовувати нічого
+        if not self.undo_log:
+            return False
+        entry = self.undo_log.pop()
+        self.put_states({name: before for name, (before, after) in entry.items()})
+        self.redo_log.append(entry)
+        return True
+
+    def redo(self):                                                                                 # Повторює останню скасовану транзакцію
+        if not self.redo_log:
+            return False
+        entry = self.redo_log.pop()
+        self.put_states({name: after for name, (before, after) in entry.items()})
+        self.undo_log.append(entry)
+        return True
+
+    def restore_records(self, rows):                                                                # Відновлює збережені записи (ім'я, телефони, порядковий номер дня народження) без повторної перевірки
+        rows = [(name, [Phone(phone) for phone in phones], birthday) for name, phones, birthday in rows] # Спершу перевіряємо всі номери, щоб помилка не лишила книгу напівзміненою
+        added = []
+        new_phones = []
+        for name, phones, birthday in rows:
+            if name in self.data:
+                continue
+            self.remember(name)
+            record = Record(name)
+            record.phones = phones
+            record.book = self
+            self.data[name] = record
+            added.append(name)
+            for phone in record.phones:
+                names = self.phone_index.get(phone)
+                if names is None:
+                    names = self.phone_index[phone] = []
+                    new_phones.append(phone)
+                names.append(name)
+            if birthday:
+                record.birthday = Birthday.from_ordinal(birthday)
+                self.index_birthday(name, record.birthday)
+        if self.search_index is not None:                                                           # До першого запиту індекси не ведемо: їх збудує build_indexes
+            self.search_index.add_many([(name, name) for name in added] + [(str(phone), name) for name in added for phone in self.data[name].phones])
+            self.suffix_index.add_many(new_phones)
+        metrics.touch(len(added))
+
+    def remove_records(self, names):                                                                # Видаляє багато контактів, оновлюючи індекси одним пакетом; повертає видалені імена
+        removed = []
+        pairs = []
+        old_phones = []
+        for name in names:
+            if name not in self.data:
+                continue
+            self.remember(name)
+            record = self.data.pop(name)
+            pairs.append((name, name))
+            for phone in record.phones:
+                others = self.phone_index.get(phone)
+                if others and name in others:
+                    others.remove(name)
+                    if not others:
+                        del self.phone_index[phone]
+                        old_phones.append(phone)
+                    pairs.append((str(phone), name))
+            if record.birthday:
+                self.unindex_birthday(name, record.birthday)
+            record.book = None
+            removed.append(name)
+        if self.search_index is not None:
+            self.search_index.remove_many(pairs)
+            self.suffix_index.remove_many(old_phones)
+        metrics.touch(len(removed))
+        return removed
+
+    def bulk_load(self, rows, batch_size=10000, workers=None):                                      # Потоково завантажує контакти пакетами, повертає (кількість, відхилені рядки)
+        loaded = 0
+        rejected = []
+        batches = iter_batches(rows, batch_size)
+        if workers and workers > 1:                                                                 # Пакети перевіряються в інших процесах, а індекси оновлює цей
+            with ProcessPoolExecutor(workers) as executor:
+                for parsed, errors in bounded_map(executor, validate_batch, batches, 2 * workers):
+                    loaded += self.load_batch(parsed, errors, rejected)
+        else:
+            for batch in batches:
+                loaded += self.load_batch(*validate_batch(batch), rejected)
+        return loaded, rejected
+
+    def load_batch(self, parsed, errors, rejected):                                                 # Додає перевірений пакет і оновлює всі індекси один раз на пакет
+        valid = []
+        seen = set()
+        for number, (name, phones, birthday) in parsed:
+            if name in self.data or name in seen:
+                errors.append((number, "Contact with this name already exists."))
+            else:
+                seen.add(name)
+                valid.append((name, phones, birthday))
+        rejected.extend(sorted(errors))
+        self.restore_records(valid)
+        self.log_many([("add", *row) for row in valid])
+        return len(valid)
+
+    def apply(self, op, args):                                                                      # Застосовує запис журналу до адресної книги
+        if op == "add":
+            self.restore_records([args])
+        elif op == "phones":
+            self.set_phones(*args)
+        elif op == "birthday":
+            self.data[args[0]].edit_birthday(args[1])
+        elif op == "delete":
+            self.delete_record(args[0])
 
     def add_record(self, name, phone, birthday=None):                                               # Додає новий запис контакту до адресної книги
         if name in self.data:
@@ -390,8 +1820,122 @@ class AddressBook:
         record.add_phone(phone)
         if birthday:
             record.add_birthday(birthday)
+        self.remember(name)
+        record.book = self
         self.data[name] = record
+        if self.search_index is not None:
+            self.search_index.add(name, name)
+        for phone_number in record.phones:
+            self.index_phone(phone_number, name)
+        if record.birthday:
+            self.index_birthday(name, record.birthday)
+        self.log("add", name, record.phones, record.birthday.ordinal if record.birthday else None)
+        metrics.touch()
         return "Contact added."
+
+    def index_phone(self, phone, name):                                                             # Додає номер телефону до зворотного індексу
+        if phone not in self.phone_index:
+            self.phone_index[phone] = []
+            if self.suffix_index is not None:
+                self.suffix_index.add(phone)
+        self.phone_index[phone].append(name)
+        if self.search_index is not None:
+            self.search_index.add(str(phone), name)
+
+    def unindex_phone(self, phone, name):                                                           # Прибирає номер телефону зі зворотного індексу
+        names = self.phone_index.get(phone)
+        if names and name in names:
+            names.remove(name)
+            if not names:
+                del self.phone_index[phone]
+                if self.suffix_index is not None:
+                    self.suffix_index.remove(phone)
+            if self.search_index is not None:
+                self.search_index.remove(str(phone), name)
+
+    def find_by_phone(self, phone):                                                                 # Повертає запис контакту за номером телефону за O(1)
+        names = self.phone_index.get(normalize_phone(phone))
+        if names:
+            return self.data[names[0]]
+        return None
+
+    def find_phones(self, digits, mode="contains", limit=None):                                     # Повертає пари (ім'я, номер) для номерів, що містять digits або закінчуються на них
+        self.build_indexes()
+        matches = []
+        for phone in self.suffix_index.search(digits, mode, limit):                                 # Кожен номер дає хоча б одну пару, тож limit номерів вистачить
+            for name in self.phone_index[phone]:
+                matches.append((name, Phone(phone)))
+                if limit and len(matches) >= limit:
+                    metrics.touch(len(matches))
+                    return matches
+        metrics.touch(len(matches))
+        return matches
+
+    def set_phones(self, name, phones):                                                             # Замінює всі номери телефону контакту
+        phones = [Phone(phone) for phone in phones]
+        self.remember(name)
+        record = self.data[name]
+        for phone in record.phones:
+            self.unindex_phone(phone, name)
+        record.phones = phones
+        for phone in record.phones:
+            self.index_phone(phone, name)
+        self.log("phones", name, record.phones)
+        metrics.touch()
+
+    def delete_record(self, name):                                                                  # Видаляє запис контакту за ім'ям разом з його індексами
+        self.remember(name)
+        record = self.data.pop(name, None)
+        if record is None:
+            return False
+        for phone in record.phones:
+            self.unindex_phone(phone, name)
+        if record.birthday:
+            self.unindex_birthday(name, record.birthday)
+        if self.search_index is not None:
+            self.search_index.remove(name, name)
+        record.book = None
+        self.log("delete", name)
+        metrics.touch()
+        return True
+
+    def build_indexes(self):                                                                        # Будує пошукові індекси за першим запитом: відкриття книги їх не чекає
+        if self.search_index is not None:
+            return
+        with self.index_lock:                                                                       # Кілька читачів сервера можуть прийти одночасно — будує лише перший
+            if self.search_index is not None:
+                return
+            search_index = SearchIndex()
+            suffix_index = PhoneSuffixIndex()
+            with gc_paused():
+                search_index.add_many([(name, name) for name in self.data] + [(str(phone), name) for phone, names in self.phone_index.items() for name in names])
+                suffix_index.add_many(list(self.phone_index))
+            self.suffix_index = suffix_index
+            self.search_index = search_index                                                        # Останнім: за ним інші потоки бачать, що індекси готові
+
+    def search(self, term, mode="substring", ignore_case=False, limit=None, offset=0):              # Шукає контакти за іменем або номером телефону через індекс
+        self.build_indexes()
+        names = self.search_index.search(term, mode, ignore_case, limit, offset)
+        metrics.touch(len(names))
+        return names
+
+    def index_birthday(self, name, birthday):                                                       # Додає день народження до календарного індексу
+        value = birthday.get_value()
+        self.birthday_index[birthday_key(value.month, value.day)].add(name)
+        if self.scheduler:
+            self.scheduler.add(name, birthday)
+
+    def unindex_birthday(self, name, birthday):                                                     # Прибирає день народження з календарного індексу
+        value = birthday.get_value()
+        self.birthday_index[birthday_key(value.month, value.day)].discard(name)
+        if self.scheduler:
+            self.scheduler.remove(name)
+
+    def delete_by_phone(self, phone):                                                               # Видаляє запис контакту за номером телефону
+        record = self.find_by_phone(phone)
+        if record is None:
+            return False
+        return self.delete_record(record.name.get_value())
     
     @input_error
     def add_birthday_to_record(self, args):                                                          # Додає дату народження до запису контакту у вказаній адресній книзі
@@ -408,36 +1952,186 @@ class AddressBook:
             return f"Contact '{name}' not found."
         
     def show_all_contacts(self):                                                                    # Виводить всі контакти, збережені в адресній книзі
-        if self.data:
-            print("All contacts:")
-            for name, record in self.data.items():
-                phones = ", ".join(record.phones)
-                birthday = record.birthday.get_value().strftime('%d-%m-%Y') if record.birthday else "No birthday specified"
-                print(f"Name: {name}, Phones: {phones}, Birthday: {birthday}")
+        show_all_contacts(self)
+
+    def iter_names(self, sort=None, cursor=None, today=None):                                       # Генерує пари (курсор, ім'я) у заданому порядку, починаючи після курсора
+        if sort is None:
+            for name in self.data:
+                yield name, name
+        elif sort == "name":                                                                        # Імена беремо з відсортованих ключів пошукового індексу
+            previous = cursor
+            self.build_indexes()
+            for text, name in self.search_index.iter_keys((cursor, cursor) if cursor else None):
+                if text == name and name != previous and (not cursor or name > cursor):
+                    yield name, name
+                    previous = name
+        elif sort == "birthday":                                                                    # Від сьогоднішнього дня по календарному індексу, без дня народження — в кінці
+            today = today or datetime.now().date()
+            start = birthday_key(today.month, today.day)
+            first_step, _, after = cursor.partition(":") if cursor else ("0", "", "")
+            for step in range(int(first_step), 366):
+                for name in sorted(self.birthday_index[(start + step) % 366]):
+                    if step == int(first_step) and after and name <= after:
+                        continue
+                    yield f"{step}:{name}", name
+            if int(first_step) < 366:
+                after = ""
+            for name in sorted(name for name, record in self.data.items() if not record.birthday):
+                if not after or name > after:
+                    yield f"366:{name}", name
         else:
-            print("No contacts found.")
+            raise ValueError(f"Unknown sort order '{sort}'.")
+
+    def iter_contacts(self, sort=None, cursor=None, fields=CONTACT_FIELDS, today=None):             # Генерує пари (курсор, словник з вибраними полями контакту)
+        for cursor, name in self.iter_names(sort, cursor, today):
+            record = self.data[name]
+            row = {}
+            if "name" in fields:
+                row["name"] = name
+            if "phones" in fields:
+                row["phones"] = record.phones
+            if "birthday" in fields:
+                row["birthday"] = record.get_birthday()
+            yield cursor, row
         
-    def get_upcoming_birthdays(self):                                                               # Знаходить контакти з майбутніми днями народження наступного тижня
-        today = datetime.now().date()
-        next_week = today + timedelta(days=7)
+    def get_upcoming_birthdays(self, days=7, today=None):                                           # Знаходить контакти з майбутніми днями народження наступного тижня
+        today = today or datetime.now().date()
         upcoming_birthdays = []
 
-        for record in self.data.values():
-            if record.birthday:
-                if record.birthday.get_value().date() < today:
-                    birthday_this_year = datetime(today.year, record.birthday.get_value().month, record.birthday.get_value().day).date()
-                    if birthday_this_year >= today and birthday_this_year < next_week:
-                        upcoming_birthdays.append(record)
+        for offset in range(days):                                                                  # Перебираємо лише дні календаря, а не всі контакти
+            day = today + timedelta(days=offset)
+            keys = [birthday_key(day.month, day.day)]
+            if day.month == 2 and day.day == 28 and not calendar.isleap(day.year):
+                keys.append(FEB_29)                                                                 # У невисокосний рік 29 лютого святкуємо 28-го
+            for key in keys:
+                for name in sorted(self.birthday_index[key]):
+                    upcoming_birthdays.append(self.data[name])
 
+        metrics.touch(len(upcoming_birthdays))
         return upcoming_birthdays
 
+    def birthday_scheduler(self, clock=None, days_ahead=0):                                         # Повертає планувальник нагадувань книги, створюючи його за першого виклику
+        if self.scheduler is None:
+            self.scheduler = BirthdayScheduler(self, clock, days_ahead)
+        return self.scheduler
+
     def show_upcoming_birthdays(self):                                                              # Виводить на екран майбутні дні народження наступного тижня                                       
         upcoming_birthdays = self.get_upcoming_birthdays()
         if upcoming_birthdays:
             print("Upcoming birthdays:")
             for record in upcoming_birthdays:
-                print(f"{record.name.get_value()}: {record.birthday.get_value().strftime('%d-%m-%Y')}")
+                print(f"{record.name.get_value()}: {record.birthday}")
         else:
             print("No upcoming birthdays")
+
+TENANT_PATTERN = re.compile(r'[A-Za-z0-9_-]+')
+
+class BookManager:                                                                                  # Видає адресні книги клієнтів за ідентифікатором, тримаючи в пам'яті лише недавні
+    def __init__(self, directory, max_books=100, max_contacts=None, compact_every=10000):
+        self.directory = directory
+        self.max_books = max_books
+        self.max_contacts = max_contacts                                                            # Необов'язкова межа сумарної кількості контактів у пам'яті
+        self.compact_every = compact_every
+        self.books = collections.OrderedDict()                                                      # Ідентифікатор -> книга, від найдавніше використаної
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+        self.pending = {}                                                                           # Ідентифікатор -> подія завершення завантаження або вивантаження книги
+        self.holders = collections.Counter()                                                        # Ідентифікатор -> скільки викликачів зараз тримають книгу
+        self.closed = False
+        os.makedirs(directory, exist_ok=True)
+
+    @contextlib.contextmanager
+    def open(self, tenant):                                                                         # Видає книгу клієнта на час блоку with; поки її тримають, вона не вивантажується
+        book = self.acquire(tenant)
+        try:
+            yield book
+        finally:
+            self.release(tenant)
+
+    def acquire(self, tenant):                                                                      # Повертає книгу клієнта, завантажуючи її за потреби, і тримає її до release
+        if not TENANT_PATTERN.fullmatch(tenant):
+            raise ValueError(f"Invalid tenant id '{tenant}'.")
+        while True:
+            with self.lock:
+                book = self.books.get(tenant)
+                if book is not None:
+                    self.books.move_to_end(tenant)
+                    self.hits += 1
+                    self.holders[tenant] += 1
+                    return book
+                done = self.pending.get(tenant)
+                if done is None:                                                                    # Книгу ніхто не завантажує і не вивантажує — завантажуємо ми
+                    done = self.pending[tenant] = threading.Event()
+                    self.misses += 1
+                    break
+            done.wait()
+        try:
+            book = AddressBook(JournalStorage(os.path.join(self.directory, tenant), self.compact_every)) # Завантаження не тримає блокування, тож інші клієнти не чекають
+        except BaseException:
+            with self.lock:
+                del self.pending[tenant]
+            done.set()
+            raise
+        with self.lock:
+            del self.pending[tenant]
+            self.books[tenant] = book
+            self.holders[tenant] += 1
+            evicted = self.evict()
+        done.set()
+        self.write_back_all(evicted)
+        return book
+
+    def release(self, tenant):                                                                      # Відпускає книгу; вивантаження, відкладені через неї, виконуються зараз
+        with self.lock:
+            self.holders[tenant] -= 1
+            if self.holders[tenant]:
+                return
+            del self.holders[tenant]
+            evicted = self.evict()
+        self.write_back_all(evicted)
+
+    def evict(self):                                                                                # Вивантажує найдавніше використані книги, поки не вкладемося в межі
+        evicted = []
+        for tenant in list(self.books):                                                             # Від найдавніше використаної
+            if not (self.closed or len(self.books) > 1 and (len(self.books) > self.max_books or (self.max_contacts and self.contacts() > self.max_contacts))):
+                break
+            if self.holders[tenant]:                                                                # Книгу зараз використовують — її вивантажить останній release
+                continue
+            book = self.books.pop(tenant)
+            self.pending[tenant] = threading.Event()                                                # Поки журнал згортається, повторне завантаження книги чекає
+            evicted.append((tenant, book))
+            if not self.closed:
+                self.evictions += 1
+        return evicted
+
+    def write_back_all(self, evicted):                                                              # Записує вивантажені книги поза блокуванням і відпускає тих, хто їх чекає
+        for tenant, book in evicted:
+            try:
+                self.write_back(book)
+            finally:
+                with self.lock:
+                    done = self.pending.pop(tenant)
+                done.set()
+
+    def contacts(self):                                                                             # Сумарна кількість контактів у завантажених книгах
+        return sum(len(book.data) for book in self.books.values())
+
+    def write_back(self, book):                                                                     # Згортає журнал зміненої книги у знімок і закриває її сховище
+        if book.storage.pending:
+            book.storage.compact(wait=True)
+        book.storage.close()
+
+    def stats(self):                                                                                # Повертає лічильники влучань, промахів і вивантажень
+        with self.lock:
+            return {"books": len(self.books), "contacts": self.contacts(), "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+    def close(self):                                                                                # Записує і закриває всі завантажені книги
+        with self.lock:
+            self.closed = True                                                                      # Книги, які ще тримають, закриє їхній останній release
+            evicted = self.evict()
+        self.write_back_all(evicted)
+
 if __name__ == "__main__":
     main()
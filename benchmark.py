@@ -0,0 +1,156 @@
+import argparse
+import contextlib
+import io
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+from DZ_Modul_10_1_2 import AddressBook, search_records, delete_contact_by_phone, show_all_contacts
+
+try:
+    import resource
+except ImportError:                                                                                 # На Windows модуля resource немає
+    resource = None
+
+def generate_contacts(count, seed=42, start=0):                                                     # Генерує випадкові контакти: ім'я, 10-значний телефон, дата народження
+    rng = random.Random(seed + start)
+    for i in range(start, start + count):
+        name = f"user{i:07d}"
+        phone = f"0{rng.randrange(10 ** 9):09d}"
+        day = date(2000, 1, 1) + timedelta(days=rng.randrange(366))                                 # Рівномірно по всіх днях високосного року, включно з 29 лютого
+        year = rng.choice(range(1952, 2012, 4)) if (day.month, day.day) == (2, 29) else rng.randint(1950, 2010)
+        birthday = f"{day.day:02d}-{day.month:02d}-{year}"
+        yield name, phone, birthday
+
+def build_book(count):                                                                              # Створює адресну книгу заданого розміру
+    book = AddressBook()
+    book.bulk_load({"name": name, "phone": phone, "birthday": birthday} for name, phone, birthday in generate_contacts(count))
+    book.build_indexes()                                                                            # Пошукові індекси будуються за першим запитом — не вимірюємо це у search_records
+    return book
+
+def measure_memory(count):                                                                          # Вимірює кількість байтів на один контакт в адресній книзі
+    contacts = list(generate_contacts(count))
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    book = AddressBook()
+    for name, phone, birthday in contacts:
+        book.add_record(name, phone, birthday)
+    book.build_indexes()                                                                            # Пам'ять рахуємо разом з пошуковими індексами
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return (after - before) / count
+
+def percentile(samples, fraction):                                                                  # Повертає перцентиль з відсортованого списку
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+def run_operation(calls, traced_calls):                                                             # Вимірює затримку кожного виклику, а потім пікову пам'ять на кількох інших
+    samples = []
+    started = time.perf_counter()
+    for call in calls:
+        begin = time.perf_counter()
+        call()
+        samples.append(time.perf_counter() - begin)
+    elapsed = time.perf_counter() - started
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    for call in traced_calls:
+        call()
+    peak = tracemalloc.get_traced_memory()[1] - base
+    tracemalloc.stop()
+    samples.sort()
+    return {
+        "ops": len(samples),
+        "throughput": len(samples) / elapsed if elapsed else None,
+        "p50_us": percentile(samples, 0.50) * 1e6,
+        "p99_us": percentile(samples, 0.99) * 1e6,
+        "peak_kib": peak / 1024,
+    }
+
+def benchmark_size(size, ops, seed=42):                                                             # Запускає всі операції для книги заданого розміру
+    book = build_book(size)
+    rng = random.Random(seed)
+    extra = list(generate_contacts(ops + 5, start=size))                                            # Нові контакти для додавання та видалення
+    names = list(book.data)
+    terms = [rng.choice(names)[:rng.randint(5, 8)] for _ in range(ops + 5)]
+    listing_ops = max(1, min(ops, 10 ** 6 // size))
+    sink = io.StringIO()
+
+    def show_all():
+        with contextlib.redirect_stdout(sink):
+            show_all_contacts(book)
+        sink.seek(0)
+        sink.truncate()
+
+    operations = {
+        "add_record": [lambda c=c: book.add_record(*c) for c in extra],
+        "search_records": [lambda t=t: search_records([t, "--limit", "20"], book) for t in terms],
+        "delete_contact_by_phone": [lambda c=c: delete_contact_by_phone([c[1]], book) for c in extra],
+        "get_upcoming_birthdays": [lambda d=d: book.get_upcoming_birthdays(today=date(2024, 1, 1) + timedelta(days=d)) for d in range(ops + 5)],
+        "show_all_contacts": [show_all] * (listing_ops + 1),                                        # Повний перелік дорогий, тому викликів менше
+    }
+    results = []
+    for operation, calls in operations.items():
+        count = len(calls) - (1 if operation == "show_all_contacts" else 5)
+        result = run_operation(calls[:count], calls[count:])
+        results.append({"size": size, "operation": operation, **result})
+    return results
+
+def compare(results, baseline, tolerance):                                                          # Повертає список регресій відносно збереженого базового запуску
+    previous = {(row["size"], row["operation"]): row for row in baseline["results"]}
+    regressions = []
+    for row in results:
+        old = previous.get((row["size"], row["operation"]))
+        if not old:
+            continue
+        if row["p50_us"] > old["p50_us"] * (1 + tolerance):                                         # p99 на малій кількості викликів надто шумний для порівняння
+            regressions.append(f"{row['operation']} @ {row['size']}: p50_us {old['p50_us']:.1f} -> {row['p50_us']:.1f}")
+        if old["throughput"] and row["throughput"] < old["throughput"] / (1 + tolerance):
+            regressions.append(f"{row['operation']} @ {row['size']}: throughput {old['throughput']:.0f} -> {row['throughput']:.0f}")
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark AddressBook hot paths.")
+    parser.add_argument("--sizes", default="1000,10000,100000,1000000", help="comma separated book sizes")
+    parser.add_argument("--ops", type=int, default=1000, help="operations measured per size")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="write JSON results to this file instead of stdout")
+    parser.add_argument("--baseline", help="fail if results regress against this JSON file")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="allowed slowdown against the baseline")
+    parser.add_argument("--memory", type=int, help="only report bytes per contact for this many contacts")
+    args = parser.parse_args(argv)
+
+    if args.memory:
+        print(f"Contacts: {args.memory}, bytes per contact: {measure_memory(args.memory):.0f}")
+        return 0
+
+    results = []
+    for size in (int(size) for size in args.sizes.split(",")):
+        results.extend(benchmark_size(size, args.ops, args.seed))
+        print(f"size {size} done", file=sys.stderr)
+    report = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "max_rss_kib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss if resource else None,
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.write(text + "\n")
+    else:
+        print(text)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as file:
+            regressions = compare(results, json.load(file), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,173 @@
+import asyncio
+import threading
+from datetime import date, timedelta
+
+import DZ_Modul_10_1_2 as m
+
+
+class Clock:                                                                                        # Підмінний годинник для планувальника нагадувань
+    def __init__(self, today):
+        self.today = today
+
+    def __call__(self):
+        return self.today
+
+
+def make_book(today, days_ahead=0):                                                                 # Книга з двома контактами і планувальником на підмінному годиннику
+    book = m.AddressBook()
+    book.add_record("ann", "0500000001", "01-05-1990")
+    book.add_record("bob", "0500000002", "03-05-1985")
+    clock = Clock(today)
+    return book, book.birthday_scheduler(clock=clock, days_ahead=days_ahead), clock
+
+
+def test_scheduler_fires_each_birthday_once():
+    book, scheduler, clock = make_book(date(2024, 4, 30))
+    assert list(scheduler.due()) == []
+    clock.today = date(2024, 5, 1)
+    assert list(scheduler.due()) == [(date(2024, 5, 1), "ann")]
+    assert list(scheduler.due()) == []
+    clock.today = date(2024, 5, 3)
+    assert list(scheduler.due()) == [(date(2024, 5, 3), "bob")]
+    clock.today = date(2025, 5, 1)
+    assert list(scheduler.due()) == [(date(2025, 5, 1), "ann")]
+
+
+def test_scheduler_does_not_repeat_after_edit_or_undo():
+    book, scheduler, clock = make_book(date(2024, 5, 1))
+    assert list(scheduler.due()) == [(date(2024, 5, 1), "ann")]
+    book.data["ann"].edit_birthday("01-05-1991")                                                     # Та сама дата після редагування не повторює нагадування
+    assert list(scheduler.due()) == []
+    with book.transaction():
+        book.delete_record("ann")
+    assert book.undo()                                                                                     # Повернений контакт теж не отримує нагадування вдруге
+    assert list(scheduler.due()) == []
+    clock.today = date(2025, 5, 1)
+    assert list(scheduler.due()) == [(date(2024, 5, 3), "bob"), (date(2025, 5, 1), "ann")]
+
+
+def test_scheduler_reminds_days_ahead():
+    book, scheduler, clock = make_book(date(2024, 4, 28), days_ahead=3)
+    assert list(scheduler.due()) == [(date(2024, 5, 1), "ann")]
+    clock.today += timedelta(days=1)
+    assert list(scheduler.due()) == []
+    book.add_record("cat", "0500000003", "02-05-2000")                                                # День уже перевіреного вікна — нагадування наступного року
+    clock.today += timedelta(days=1)
+    assert list(scheduler.due()) == [(date(2024, 5, 3), "bob")]
+    clock.today = date(2025, 4, 29)
+    assert list(scheduler.due()) == [(date(2025, 5, 1), "ann"), (date(2025, 5, 2), "cat")]
+
+
+async def request(port, lines):                                                                     # Надсилає команди окремим клієнтом і повертає відповіді без рамок
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write("".join(line + "\n" for line in lines).encode("utf-8"))
+    await writer.drain()
+    responses = []
+    for _ in lines:
+        response = []
+        while (line := (await reader.readline()).decode("utf-8").rstrip("\n")) != ".":
+            response.append(line)
+        responses.append("\n".join(response))
+    writer.close()
+    await writer.wait_closed()
+    return responses
+
+
+def test_server_serves_concurrent_local_clients(tmp_path):
+    async def scenario():
+        book = m.AddressBook()
+        server = m.BookServer(book)
+        await server.start(port=0)
+        port = server.server.sockets[0].getsockname()[1]
+        try:
+            replies = await asyncio.gather(*(request(port, [f"add user{i} 05000000{i:02d}", f"phone user{i}"]) for i in range(20)))
+            rejected = await request(port, [f"export {tmp_path / 'book.csv'}", f"import {tmp_path / 'book.csv'}", "stats on --dump x", "bogus"])
+        finally:
+            await server.close()
+        return book, replies, rejected
+
+    book, replies, rejected = asyncio.run(scenario())
+    assert len(book.data) == 20
+    for i, (added, phone) in enumerate(replies):
+        assert added == "Contact added."
+        assert f"05000000{i:02d}" in phone
+    assert rejected == ["Command is not available over the network."] * 3 + ["Invalid command."]
+    assert not (tmp_path / "book.csv").exists()
+
+
+def test_undo_of_large_transaction_restores_indexes():
+    book = m.AddressBook()
+    book.add_record("Ann", "0500000001")
+    with book.transaction():
+        book.restore_records([(f"user{i}", [m.Phone(500001000 + i)], None) for i in range(600)]) # Досить великий пакет для пакетного видалення з індексів
+        book.delete_record("Ann")
+    assert book.search("user59") and book.find_phones("001599")
+    assert book.undo()
+    assert list(book.data) == ["Ann"]
+    assert book.search("user") == [] and book.search("ann", ignore_case=True) == ["Ann"]
+    assert book.find_phones("0500") == [("Ann", m.Phone("0500000001"))]
+    assert book.redo()
+    assert len(book.data) == 600 and book.find_phones("001599") == [("user599", m.Phone("0500001599"))]
+
+
+def test_import_is_streamed_outside_the_undo_log(tmp_path):
+    path = tmp_path / "contacts.jsonl"
+    path.write_text("".join(f'{{"name": "user{i}", "phones": ["05000010{i:02d}"]}}\n' for i in range(50)))
+    book = m.AddressBook()
+    assert m.execute(f"import {path}", book) == "Imported 50 contacts, rejected 0 rows."
+    assert len(book.data) == 50 and not book.undo_log
+
+
+def test_reopened_book_builds_search_indexes_on_first_query(tmp_path):
+    path = str(tmp_path / "book")
+    storage = m.JournalStorage(path)
+    book = m.AddressBook(storage)
+    book.add_record("Ann", "0501234567", "01-05-1990")
+    book.add_record("Bob", "0507654321")
+    storage.compact(wait=True)
+    book.add_record("Cat", "0509999999")
+    storage.close()
+    reopened = m.AddressBook(m.JournalStorage(path))
+    assert reopened.search_index is None                                                            # Відкриття книги не будує пошукові індекси
+    reopened.add_record("Dan", "0501111111")
+    reopened.delete_record("Bob")
+    assert reopened.search("an", ignore_case=True) == ["Ann", "Dan"]
+    assert reopened.find_phones("4567") == [("Ann", m.Phone("0501234567"))]
+    assert reopened.find_phones("9999", "ends") == [("Cat", m.Phone("0509999999"))]
+    reopened.storage.close()
+
+
+def test_manager_does_not_evict_books_in_use(tmp_path):
+    manager = m.BookManager(str(tmp_path), max_books=2)
+    with manager.open("a") as a:
+        for tenant in ("b", "c"):
+            with manager.open(tenant) as book:
+                book.add_record("ann", "0500000001")
+        assert "a" in manager.books                                                                 # Книгу тримають — вивантажено іншу
+        assert a.add_record("bob", "0500000002") == "Contact added."
+    assert manager.stats()["books"] == 2
+    manager.close()
+    with m.BookManager(str(tmp_path)).open("a") as reopened:
+        assert list(reopened.data) == ["bob"]
+
+
+def test_manager_keeps_concurrent_writes(tmp_path):
+    manager = m.BookManager(str(tmp_path), max_books=2, compact_every=5)
+
+    def worker(tenant):
+        for i in range(40):
+            with manager.open(tenant) as book:
+                book.add_record(f"user{i}", f"05000000{i:02d}")
+
+    threads = [threading.Thread(target=worker, args=(tenant,)) for tenant in ("a", "b", "c", "d", "a")]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    manager.close()
+    reopened = m.BookManager(str(tmp_path))
+    for tenant in "abcd":
+        with reopened.open(tenant) as book:
+            assert len(book.data) == 40
+    reopened.close()
+    assert manager.stats()["books"] == 0 and not manager.pending